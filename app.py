@@ -1,12 +1,19 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-import pickle
 import os
-import requests
-import time
 import random
 from urllib.parse import quote_plus
 from datetime import datetime
+from concurrent.futures import as_completed, TimeoutError as FuturesTimeout
+
+from mrs import auth, metrics, model_store, service, user_store, voice
+from mrs.registry import ModelRegistry
+from mrs.auth import Authenticator
+from mrs.stats import UserProfile
+from mrs.user_store import UserStore
+from mrs.posters import PosterService
+from mrs.voice import VoiceSearch, resolve_title
 
 # -------------------- PAGE CONFIG --------------------
 st.set_page_config(
@@ -23,14 +30,8 @@ if 'user_name' not in st.session_state:
     st.session_state.user_name = ""
 if 'voice_text' not in st.session_state:
     st.session_state.voice_text = ""
-if 'favorites' not in st.session_state:
-    st.session_state.favorites = []
-if 'play_history' not in st.session_state:
-    st.session_state.play_history = []
 if 'user_mood' not in st.session_state:
     st.session_state.user_mood = "Happy"
-if 'now_playing' not in st.session_state:
-    st.session_state.now_playing = None
 if 'login_time' not in st.session_state:
     st.session_state.login_time = None
 
@@ -133,37 +134,83 @@ def play_song_on_youtube(song_name, artist):
     """, unsafe_allow_html=True)
     
     # Add to play history
-    if song_name not in st.session_state.play_history:
-        st.session_state.play_history.append(song_name)
+    record_play(song_name)
     
     # Set now playing
-    st.session_state.now_playing = song_name
+    user_data.set_now_playing(song_name)
+
+# -------------------- USER DATA --------------------
+
+def user_profile():
+    """This user's mood/genre aggregates, rebuilt only when the model changes"""
+    profile = st.session_state.get('profile')
+    if profile is None or not profile.matches(catalog):
+        profile = UserProfile(catalog, user_data.favorites, user_data.history)
+        st.session_state.profile = profile
+    return profile
+
+def add_favorite(song_name):
+    """Add a song to favorites; False if it was already there"""
+    if not user_data.add_favorite(song_name):
+        return False
+    user_profile().add_favorite(catalog, song_name)
+    return True
+
+def remove_favorite(song_name):
+    if song_name in user_data.favorites:
+        user_data.remove_favorite(song_name)
+        user_profile().remove_favorite(catalog, song_name)
+
+def record_play(song_name):
+    if user_data.record_play(song_name):
+        user_profile().add_play(catalog, song_name)
 
 # -------------------- HELPER FUNCTIONS --------------------
 
-def display_song_card(row, show_favorite=True):
-    """Display a song card with consistent formatting"""
-    if new_df is None or new_df.empty:
+PAGE_SIZE = 10
+
+def paginate(key, total, page_size=PAGE_SIZE, reset_on=None):
+    """Render pager controls and return the (start, end) slice of the visible page"""
+    pages = max(1, -(-total // page_size))
+    page_key, token_key = f"page_{key}", f"page_{key}_token"
+    if st.session_state.get(token_key) != reset_on:
+        st.session_state[token_key] = reset_on
+        st.session_state[page_key] = 0
+    page = min(st.session_state.get(page_key, 0), pages - 1)
+    
+    if pages > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("⬅️ Prev", key=f"{page_key}_prev", disabled=page == 0):
+                page = max(page - 1, 0)
+        with col3:
+            if st.button("Next ➡️", key=f"{page_key}_next", disabled=page >= pages - 1):
+                page = min(page + 1, pages - 1)
+        with col2:
+            st.markdown(f"<div style='text-align: center;'>Page {page + 1} of {pages}</div>", unsafe_allow_html=True)
+    
+    st.session_state[page_key] = page
+    start = page * page_size
+    return start, min(start + page_size, total)
+
+def display_song_card(song, show_favorite=True, key_prefix=""):
+    """Display a song card (a service song dict) with consistent formatting"""
+    if not len(catalog):
         st.error("No data available")
         return
         
-    song_col = new_df.columns[0]
-    song_name = row[song_col]
-    artist = row.get('Album/Movie', row.get('Singer/Artists', 'Unknown'))
-    mood = row.get('Mood', 'Unknown')
-    rating = row.get('User-Rating', 'N/A')
-    genre = row.get('Genre', 'Unknown')
+    song_name = song['title']
+    artist = song['artist']
+    mood = song['mood'] or 'Unknown'
+    rating = 'N/A' if song['rating'] is None else song['rating']
+    genre = song['genre']
     
     youtube_url = get_youtube_url(song_name, artist)
-    poster = fetch_poster(str(song_name), str(artist))
     
     col1, col2 = st.columns([1, 4])
     
     with col1:
-        if poster and os.path.exists(poster):
-            st.image(poster, use_container_width=True)
-        else:
-            st.markdown("<div style='text-align: center; font-size: 3rem;'>🎵</div>", unsafe_allow_html=True)
+        show_poster(song_name, artist)
     
     with col2:
         st.markdown(f"""
@@ -182,17 +229,16 @@ def display_song_card(row, show_favorite=True):
     col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
     
     with col1:
-        if st.button("▶️ Play", key=f"play_{song_name}"):
+        if st.button("▶️ Play", key=f"{key_prefix}play_{song_name}"):
             play_song_on_youtube(song_name, artist)
     
     with col2:
-        if show_favorite and st.button("❤️ Favorite", key=f"fav_{song_name}"):
-            if song_name not in st.session_state.favorites:
-                st.session_state.favorites.append(song_name)
+        if show_favorite and st.button("❤️ Favorite", key=f"{key_prefix}fav_{song_name}"):
+            if add_favorite(song_name):
                 st.success(f"Added {song_name} to favorites!")
     
     with col3:
-        if st.button("🔍 Similar", key=f"sim_{song_name}"):
+        if st.button("🔍 Similar", key=f"{key_prefix}sim_{song_name}"):
             st.session_state.voice_text = song_name
             st.rerun()
     
@@ -214,6 +260,49 @@ def display_song_card(row, show_favorite=True):
         """, unsafe_allow_html=True)
 
 # -------------------- LOGIN --------------------
+SESSION_COOKIE = "mrs_session"
+DEMO_USERS = os.environ.get(auth.DEMO_ENV) == "1"
+
+@st.cache_resource
+def get_authenticator():
+    authenticator = Authenticator(os.environ.get('MRS_USER_DB', user_store.DEFAULT_PATH))
+    if DEMO_USERS:
+        authenticator.seed_demo_users()
+    return authenticator
+
+def get_session_token():
+    return st.context.cookies.get(SESSION_COOKIE)
+
+def set_session_token(token):
+    """Store (or with None, clear) the session cookie on the next render"""
+    st.session_state.pending_cookie = token or ""
+
+def write_session_cookie():
+    # Streamlit can't set response cookies; a zero-height component sets it in the browser
+    token = st.session_state.pop('pending_cookie', None)
+    if token is None:
+        return
+    max_age = get_authenticator().token_ttl if token else 0
+    components.html(f"""<script>
+        const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+        window.parent.document.cookie = "{SESSION_COOKIE}={token}; Max-Age={int(max_age)}; Path=/; SameSite=Strict" + secure;
+    </script>""", height=0)
+
+def start_session(username, token):
+    st.session_state.logged_in = True
+    st.session_state.user_name = username
+    st.session_state.session_token = token
+    st.session_state.login_time = datetime.now()
+
+def resume_session():
+    """Log in from a still-valid session cookie"""
+    token = get_session_token()
+    username = get_authenticator().user_for_token(token)
+    if username:
+        start_session(username, token)
+        return True
+    return False
+
 def login():
     st.markdown("<h1 class='main-title'>🔐 MRS Punjabi v4.0</h1>", unsafe_allow_html=True)
     
@@ -225,23 +314,30 @@ def login():
             password = st.text_input("🔒 Password", type="password")
             
             if st.button("🚀 Login to Music World", use_container_width=True):
-                if username == "gursimran" and password == "12345":
-                    st.session_state.logged_in = True
-                    st.session_state.user_name = username
-                    st.session_state.login_time = datetime.now()
-                    st.success("🎉 Login successful! Welcome to your music universe!")
-                    time.sleep(1)
+                # Hashing runs on the auth pool, off this script thread
+                with st.spinner("Checking credentials..."):
+                    token = get_authenticator().submit_login(username, password).result()
+                if token:
+                    start_session(username, token)
+                    set_session_token(token)
+                    st.session_state.login_message = True
                     st.rerun()
                 else:
                     st.error("❌ Invalid credentials!")
             
-            st.info("**Demo Credentials:** 👤 Username: `gursimran` | 🔒 Password: `12345`")
+            if DEMO_USERS:
+                st.info("**Demo Credentials:** 👤 Username: `gursimran` | 🔒 Password: `12345`")
+
+write_session_cookie()
 
 # Check login status
-if not st.session_state.logged_in:
+if not st.session_state.logged_in and not resume_session():
     login()
     st.stop()
 
+if st.session_state.pop('login_message', False):
+    st.success("🎉 Login successful! Welcome to your music universe!")
+
 # -------------------- LOAD DATA --------------------
 @st.cache_resource
 def load_models():
@@ -250,152 +346,150 @@ def load_models():
             st.error("❌ Models folder not found. Run preprocess_data.py first.")
             st.stop()
         
-        new_df = pickle.load(open('models/musicrec.pkl', 'rb'))
-        similarity = pickle.load(open('models/similarities.pkl', 'rb'))
-        return new_df, similarity
+        # Shared by every session; swaps in newly published releases by itself
+        registry = ModelRegistry('models')
+        # Cached results are per model version; drop the old version's on reload
+        service.CACHE.watch(registry)
+        return registry
+    except model_store.StaleModelError as e:
+        st.error(f"❌ Model build is out of date: {e}. Run `python -m mrs.model_store export` to rebuild.")
+        st.stop()
     except Exception as e:
         st.error(f"Error loading models: {e}")
         st.stop()
 
-new_df, similarity = load_models()
+metrics.start_rerun()
+
+# One snapshot per rerun: a model swap mid-render never mixes two versions
+with metrics.timer("load_models"):
+    catalog = load_models().current()
+
+@st.cache_resource
+def get_user_store():
+    return UserStore(os.environ.get('MRS_USER_DB', user_store.DEFAULT_PATH))
 
-# Create posters directory
-os.makedirs('posters', exist_ok=True)
+# Favorites and plays live in the shared store; this session keeps one user's copy
+if st.session_state.get('user_data') is None or st.session_state.user_data.user != st.session_state.user_name:
+    st.session_state.user_data = get_user_store().session(st.session_state.user_name)
+user_data = st.session_state.user_data
+
+@st.cache_resource
+def get_poster_service():
+    return PosterService('posters')
+
+poster_service = get_poster_service()
+# Poster slots still waiting on a download in this rerun
+pending_posters = []
 
 # -------------------- ENHANCED FUNCTIONS --------------------
 
-def simulate_voice_search():
-    """Enhanced voice search simulation"""
-    punjabi_songs = [
-        "Brown Munde", "Excuses", "295", "Lehanga", "Qismat", 
-        "So High", "Sakhiyan", "Daang", "Lahore", "Prada",
-        "Bambiha Bole", "Old Skool", "Diamond", "Viah", "Jatt da Muqabala"
-    ]
-    
-    with st.spinner("🎤 Listening... Speak the song name clearly"):
-        time.sleep(2)
-    
-    selected_song = random.choice(punjabi_songs)
-    return selected_song
-
-def fetch_poster(song, artist):
-    """Enhanced poster fetching with caching"""
-    filename = f"posters/{song}_{artist}.jpg".replace('/', '_').replace('\\', '_')[:100]
-    if os.path.exists(filename):
-        return filename
+@st.cache_resource
+def get_voice_search():
+    return VoiceSearch(os.environ.get('MRS_VOSK_MODEL', voice.DEFAULT_MODEL_PATH))
+
+def voice_search(audio, status):
+    """Transcribe a clip, showing partial text in ``status``; returns the search text"""
+    job = get_voice_search().submit(audio)
+    for partial in job.updates():
+        status.markdown(f"🎤 *{partial or 'Listening...'}*")
+    if job.error is not None:
+        status.error(f"❌ Could not read that recording: {job.error}")
+        return None
+    if not job.text:
+        status.warning("🤔 Didn't catch that. Try again, closer to the mic.")
+        return None
+    # Prefer an actual song title; otherwise search for what was said
+    return resolve_title(catalog, job.text) or job.text
+
+POSTER_PLACEHOLDER = "<div style='text-align: center; font-size: 3rem;'>🎵</div>"
+# Longest a rerun waits on downloads; later ones are cached and shown by the next rerun
+POSTER_WAIT_SECONDS = 1.0
+
+def read_poster(path):
+    """Poster bytes, or None if another worker evicted the file since our manifest was loaded"""
     try:
-        query = quote_plus(f"{song} {artist} punjabi song")
-        url = f"https://itunes.apple.com/search?term={query}&limit=1&media=music"
-        r = requests.get(url, timeout=5)
-        data = r.json()
-        if data.get('results'):
-            artwork = data['results'][0].get('artworkUrl100')
-            if artwork:
-                artwork = artwork.replace('100x100bb', '400x400bb')
-                img_data = requests.get(artwork, timeout=5).content
-                with open(filename, 'wb') as f:
-                    f.write(img_data)
-                return filename
-    except Exception:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
         return None
-    return None
 
+def show_poster(song, artist, placeholder=POSTER_PLACEHOLDER, container=st):
+    """Show a cached poster now, or a placeholder that is filled in once it downloads"""
+    path = poster_service.cached(str(song), str(artist))
+    if path:
+        # Streamlit reports a missing image path with its own exception type, so read it first
+        image = read_poster(path)
+        if image is not None:
+            container.image(image, use_container_width=True)
+            metrics.incr("poster.cache_hit")
+            return
+        poster_service.cache.invalidate(str(song), str(artist))
+    slot = container.empty()
+    slot.markdown(placeholder, unsafe_allow_html=True)
+    pending_posters.append((slot, poster_service.submit(str(song), str(artist))))
+
+@metrics.timed("posters.wait")
+def fill_pending_posters(timeout=POSTER_WAIT_SECONDS):
+    """Swap placeholders for posters whose downloads finish within ``timeout``
+
+    Downloads still running carry on in the background; the placeholder
+    stays until the next rerun finds the poster in the cache.
+    """
+    slots = {future: slot for slot, future in pending_posters}
+    try:
+        for future in as_completed(slots, timeout=timeout):
+            path = future.result()
+            image = read_poster(path) if path else None
+            if image is not None:
+                slots[future].image(image, use_container_width=True)
+    except FuturesTimeout:
+        pass
+    pending_posters.clear()
+
+@metrics.timed("recommend")
 def recommend(song_title, topn=5):
     """Enhanced recommendation with mood-based filtering"""
     try:
-        song_col = new_df.columns[0]
-        idx = new_df[new_df[song_col] == song_title].index[0]
-        distances = similarity[idx]
-        
-        rating_col = None
-        for col in new_df.columns:
-            if 'rating' in col.lower():
-                rating_col = col
-                break
-        
-        if rating_col:
-            ratings = new_df[rating_col].fillna(0).astype(float).values
-            hybrid_score = distances * 0.7 + (ratings / ratings.max()) * 0.3
-        else:
-            hybrid_score = distances
-            
-        recs = sorted(list(enumerate(hybrid_score)), reverse=True, key=lambda x: x[1])[1:topn + 1]
-        results = []
-        
-        for i, score in recs:
-            row = new_df.iloc[i]
-            results.append({
-                'title': row[song_col],
-                'artist': row.get('Album/Movie', row.get('Singer/Artists', 'Unknown')),
-                'genre': row.get('Genre', 'Unknown'),
-                'rating': row.get('User-Rating', 'N/A'),
-                'mood': row.get('Mood', 'Unknown'),
-                'similarity': f"{score:.1%}",
-                'score': score
-            })
-        return results
+        return recommendation_results(service.recommend(catalog, song_title, topn))
     except Exception as e:
         return []
 
-def get_mood_recommendations(mood, topn=10):
-    """Get songs based on specific mood"""
-    mood_col = 'Mood'
-    if mood_col in new_df.columns:
-        mood_songs = new_df[new_df[mood_col].str.contains(mood, case=False, na=False)]
-        if not mood_songs.empty:
-            rating_col = None
-            for col in new_df.columns:
-                if 'rating' in col.lower():
-                    rating_col = col
-                    break
-            
-            if rating_col:
-                mood_songs = mood_songs.nlargest(topn, rating_col)
-            else:
-                mood_songs = mood_songs.head(topn)
-            
-            return mood_songs
-    return pd.DataFrame()
+def recommendation_results(songs):
+    """Service song dicts plus the display fields the cards use (results are cached, so copy)"""
+    return [{**song, 'similarity': f"{song['score']:.1%}",
+             'rating': 'N/A' if song['rating'] is None else song['rating']} for song in songs]
 
+@metrics.timed("recommend_for_you")
+def recommend_for_you(topn=5, recent_plays=10):
+    """One ranked feed from all favorites plus recent plays, newest plays weighted most"""
+    return recommendation_results(service.recommend_for_you(
+        catalog, user_data.favorites, user_data.history, topn=topn, recent_plays=recent_plays))
+
+@metrics.timed("get_mood_recommendations")
+def get_mood_recommendations(mood, topn=10, match='any'):
+    """Get songs based on a mood, or a list of moods matching any or all of them"""
+    # Rows come pre-sorted by rating, so this is a slice rather than a scan
+    return service.mood(catalog, mood, topn, match)
+
+@metrics.timed("generate_playlist_by_mood")
 def generate_playlist_by_mood(mood, duration_minutes=60):
     """Generate a playlist for specific mood and duration"""
-    mood_songs = get_mood_recommendations(mood, topn=20)
-    if mood_songs.empty:
-        return []
-    
-    playlist = []
-    total_duration = 0
-    target_duration = duration_minutes * 60  # Convert to seconds
-    
-    for _, song in mood_songs.iterrows():
-        if total_duration >= target_duration:
-            break
-        
-        # Simulate song duration (3-5 minutes)
-        song_duration = random.randint(180, 300)
-        playlist.append({
-            'title': song[new_df.columns[0]],
-            'artist': song.get('Album/Movie', 'Unknown'),
-            'duration': f"{song_duration//60}:{song_duration%60:02d}",
-            'mood': song.get('Mood', 'Unknown'),
-            'youtube_url': get_youtube_url(song[new_df.columns[0]], song.get('Album/Movie', 'Unknown'))
-        })
-        total_duration += song_duration
-    
-    return playlist
+    # Songs without a real length get a stable estimate; mark those with "~"
+    return [{**song, 'duration': f"{'~' if song['estimated_length'] else ''}{song['seconds']//60}:{song['seconds']%60:02d}",
+             'youtube_url': get_youtube_url(song['title'], song['artist'])}
+            for song in service.playlist(catalog, mood, duration_minutes)['songs']]
 
 def create_mood_chart_text():
     """Create text-based mood distribution"""
-    if 'Mood' in new_df.columns:
-        mood_counts = new_df['Mood'].value_counts()
+    if catalog.stats['moods'] is not None:
         st.subheader("🎭 Music Mood Distribution")
-        for mood, count in mood_counts.items():
+        for mood, count in catalog.stats['moods']:
             st.write(f"**{mood}**: {count} songs")
         return True
     return False
 
 # -------------------- ENHANCED SIDEBAR --------------------
-with st.sidebar:
+with st.sidebar, metrics.timer("render.sidebar"):
     # Safe access to user_name with default value
     welcome_name = st.session_state.user_name if st.session_state.user_name else "Guest"
     st.markdown(f"### 👋 Welcome, {welcome_name}!")
@@ -407,9 +501,9 @@ with st.sidebar:
     st.markdown("---")
     
     # Now Playing Section
-    if st.session_state.now_playing:
+    if user_data.now_playing:
         st.markdown("### 🎵 Now Playing")
-        st.success(f"**{st.session_state.now_playing}**")
+        st.success(f"**{user_data.now_playing}**")
         st.markdown("---")
     
     # User Mood Selector
@@ -429,14 +523,14 @@ with st.sidebar:
     st.markdown("### 📊 Your Stats")
     col1, col2 = st.columns(2)
     with col1:
-        st.metric("Favorites", len(st.session_state.favorites))
+        st.metric("Favorites", len(user_data.favorites))
     with col2:
-        st.metric("Songs Played", len(st.session_state.play_history))
+        st.metric("Songs Played", len(user_data.history))
     
     # Recent Activity
-    if st.session_state.play_history:
+    if user_data.history:
         st.markdown("#### 🕐 Recently Played")
-        for song in st.session_state.play_history[-3:]:
+        for song in user_data.history[-3:]:
             st.write(f"• {song}")
     
     st.markdown("---")
@@ -446,17 +540,19 @@ with st.sidebar:
     if st.button("🔍 Discover New Songs"):
         st.session_state.discover_new = True
     if st.button("⭐ Random Favorite"):
-        if st.session_state.favorites:
-            st.session_state.voice_text = random.choice(st.session_state.favorites)
+        if user_data.favorites:
+            st.session_state.voice_text = random.choice(list(user_data.favorites))
     
     st.markdown("---")
     st.markdown("**👨‍💻 Developed by Gursimran Singh**")
     st.markdown("**AUP Mohali**")
     
     if st.button("🚪 Logout"):
+        get_authenticator().revoke(st.session_state.get('session_token'))
         # Clear all session state
         for key in list(st.session_state.keys()):
             del st.session_state[key]
+        set_session_token(None)
         st.rerun()
 
 # -------------------- MAIN APP WITH TABS --------------------
@@ -465,7 +561,7 @@ st.markdown("<h1 class='main-title'>🎧 MRS Punjabi v4.0 Pro</h1>", unsafe_allo
 # Create tabs for different features
 tab1, tab2, tab3, tab4, tab5 = st.tabs(["🎵 Discover", "🔍 Search", "😊 Mood Magic", "⭐ Favorites", "📊 Analytics"])
 
-with tab1:
+with tab1, metrics.timer("render.discover"):
     # Home/Dashboard
     st.subheader("🏠 Music Dashboard")
     
@@ -475,12 +571,12 @@ with tab1:
         st.markdown(f"""
         <div class='stats-card'>
             <h3>🎵</h3>
-            <h4>{len(new_df)}</h4>
+            <h4>{catalog.stats['n_songs']}</h4>
             <p>Total Songs</p>
         </div>
         """, unsafe_allow_html=True)
     with col2:
-        unique_artists = new_df['Singer/Artists'].nunique() if 'Singer/Artists' in new_df.columns else 'N/A'
+        unique_artists = catalog.stats['n_artists'] if catalog.stats['n_artists'] is not None else 'N/A'
         st.markdown(f"""
         <div class='stats-card'>
             <h3>👤</h3>
@@ -489,7 +585,7 @@ with tab1:
         </div>
         """, unsafe_allow_html=True)
     with col3:
-        avg_rating = new_df['User-Rating'].mean() if 'User-Rating' in new_df.columns else 'N/A'
+        avg_rating = catalog.stats['rating']['mean'] if catalog.stats['rating'] else 'N/A'
         st.markdown(f"""
         <div class='stats-card'>
             <h3>⭐</h3>
@@ -508,19 +604,17 @@ with tab1:
     
     # Featured Songs
     st.subheader("🔥 Featured Punjabi Hits")
-    featured_songs = new_df.sample(min(6, len(new_df)))
+    featured_songs = service.songs(catalog, random.sample(range(len(catalog)), min(6, len(catalog))))
     
     cols = st.columns(3)
-    for idx, (_, song) in enumerate(featured_songs.iterrows()):
+    for idx, song in enumerate(featured_songs):
         with cols[idx % 3]:
-            song_name = song[new_df.columns[0]]
-            artist = song.get('Album/Movie', 'Unknown')
-            mood = song.get('Mood', 'Unknown')
-            rating = song.get('User-Rating', 'N/A')
+            song_name = song['title']
+            artist = song['artist']
+            mood = song['mood'] or 'Unknown'
+            rating = 'N/A' if song['rating'] is None else song['rating']
             
-            poster = fetch_poster(song_name, artist)
-            if poster and os.path.exists(poster):
-                st.image(poster, use_container_width=True)
+            show_poster(song_name, artist)
             
             youtube_url = get_youtube_url(song_name, artist)
             
@@ -530,8 +624,7 @@ with tab1:
                 st.write(f"*{artist}*")
             with col2:
                 if st.button("❤️", key=f"fav_{idx}"):
-                    if song_name not in st.session_state.favorites:
-                        st.session_state.favorites.append(song_name)
+                    if add_favorite(song_name):
                         st.success(f"Added {song_name} to favorites!")
             
             mood_class = mood.lower().replace(' ', '')
@@ -541,7 +634,6 @@ with tab1:
             # Play button with YouTube integration
             if st.button("▶️ Play", key=f"play_{idx}"):
                 play_song_on_youtube(song_name, artist)
-                st.session_state.now_playing = song_name
             
             # Direct YouTube link
             st.markdown(f"""
@@ -561,7 +653,7 @@ with tab1:
             </a>
             """, unsafe_allow_html=True)
 
-with tab2:
+with tab2, metrics.timer("render.search"):
     # Enhanced Search Tab
     st.subheader("🔍 Smart Search & Recommendations")
     
@@ -575,37 +667,33 @@ with tab2:
         )
     with col2:
         st.markdown("<br>", unsafe_allow_html=True)
-        if st.button("🎤 Voice Search", use_container_width=True):
-            recognized_text = simulate_voice_search()
-            st.session_state.voice_text = recognized_text
-            st.success(f"🎯 Voice recognized: **{recognized_text}**")
-            st.rerun()
+        show_voice = st.toggle("🎤 Voice Search")
+    
+    if show_voice:
+        if not get_voice_search().available:
+            st.info("Voice search needs the optional `vosk` package and a Vosk model in "
+                    f"`{get_voice_search().model_path}` (or set `MRS_VOSK_MODEL`).")
+        else:
+            recording = st.audio_input("Say a song name")
+            upload = st.file_uploader("...or upload a WAV clip", type=["wav"])
+            clip = recording or upload
+            if clip is not None and st.button("🎯 Search by voice"):
+                recognized_text = voice_search(clip.getvalue(), st.empty())
+                if recognized_text:
+                    st.session_state.voice_text = recognized_text
+                    st.rerun()
     
     if search_query:
-        # Enhanced search across multiple columns
-        song_col = new_df.columns[0]
-        results = pd.DataFrame()
-        
-        # Search in song names
-        song_results = new_df[new_df[song_col].astype(str).str.contains(search_query, case=False, na=False)]
-        results = pd.concat([results, song_results])
-        
-        # Search in artists
-        if 'Singer/Artists' in new_df.columns:
-            artist_results = new_df[new_df['Singer/Artists'].astype(str).str.contains(search_query, case=False, na=False)]
-            results = pd.concat([results, artist_results])
-        
-        # Search in moods
-        if 'Mood' in new_df.columns:
-            mood_results = new_df[new_df['Mood'].astype(str).str.contains(search_query, case=False, na=False)]
-            results = pd.concat([results, mood_results])
+        # Ranked search over song names, artists and moods
+        with metrics.timer("search"):
+            results = catalog.search_index.search(search_query, page_size=None)
         
-        results = results.drop_duplicates()
-        
-        if not results.empty:
-            st.subheader(f"🔍 Found {len(results)} results for '{search_query}'")
-            for _, row in results.iterrows():
-                display_song_card(row)
+        if results.total:
+            st.subheader(f"🔍 Found {results.total} results for '{search_query}'")
+            # Only the visible page is rendered, so only its posters are fetched
+            start, end = paginate("search", results.total, reset_on=search_query)
+            for song in service.songs(catalog, results.rows[start:end]):
+                display_song_card(song, key_prefix="search_")
         else:
             st.warning("No results found. Try different keywords!")
     
@@ -613,8 +701,7 @@ with tab2:
     st.subheader("🎵 Get Personalized Recommendations")
     
     # Get available songs
-    song_col = new_df.columns[0]
-    options = new_df[song_col].astype(str).tolist()
+    options = catalog.titles.tolist()
     
     if options:
         selected_song = st.selectbox("Select a song you like:", options)
@@ -628,11 +715,8 @@ with tab2:
                     for rec in recs:
                         col1, col2 = st.columns([1, 3])
                         
-                        poster = fetch_poster(rec['title'], rec['artist'])
-                        if poster and os.path.exists(poster):
-                            col1.image(poster, use_container_width=True)
-                        else:
-                            col1.markdown("<div style='text-align: center; font-size: 2rem;'>🎵</div>", unsafe_allow_html=True)
+                        show_poster(rec['title'], rec['artist'], container=col1,
+                                    placeholder="<div style='text-align: center; font-size: 2rem;'>🎵</div>")
                         
                         youtube_link = f"https://www.youtube.com/results?search_query={quote_plus(rec['title'] + ' ' + rec['artist'])}"
                         col2.markdown(f"""
@@ -648,7 +732,7 @@ with tab2:
                 else:
                     st.error("No recommendations found for this song")
 
-with tab3:
+with tab3, metrics.timer("render.mood"):
     # Mood-based Features
     st.subheader("😊 Mood-Based Music Magic")
     
@@ -667,8 +751,11 @@ with tab3:
             playlist = generate_playlist_by_mood(mood_choice, duration)
             if playlist:
                 st.success(f"🎵 Generated {len(playlist)} songs for {mood_choice} mood!")
-                total_duration = sum([int(song['duration'].split(':')[0]) for song in playlist])
-                st.write(f"**Total Duration:** ~{total_duration} minutes")
+                total_duration = sum(song['seconds'] for song in playlist)
+                estimated = sum(song['estimated_length'] for song in playlist)
+                st.write(f"**Total Duration:** {'~' if estimated else ''}{total_duration//60}:{total_duration%60:02d}")
+                if estimated:
+                    st.caption(f"~ {estimated} of {len(playlist)} track lengths are estimates")
                 
                 for i, song in enumerate(playlist, 1):
                     col1, col2 = st.columns([3, 1])
@@ -685,16 +772,18 @@ with tab3:
     with col2:
         st.markdown("### 🎯 Quick Mood Recommendations")
         quick_moods = ["Chill", "Party", "Romantic", "Workout", "Happy"]
-        selected_quick_mood = st.selectbox("Quick mood picks:", quick_moods)
+        selected_moods = st.multiselect("Quick mood picks:", quick_moods, default=quick_moods[:1])
+        match_all = st.toggle("Songs must match every mood", value=False)
+        selected_quick_mood = (" + " if match_all else " / ").join(selected_moods) or "Mood"
         
-        if st.button(f"🎵 Get {selected_quick_mood} Songs"):
-            mood_songs = get_mood_recommendations(selected_quick_mood, 5)
-            if not mood_songs.empty:
+        if st.button(f"🎵 Get {selected_quick_mood} Songs", disabled=not selected_moods):
+            mood_songs = get_mood_recommendations(selected_moods, 5, "all" if match_all else "any")
+            if mood_songs:
                 st.success(f"🎵 Top {selected_quick_mood} Songs:")
-                for idx, (_, song) in enumerate(mood_songs.iterrows()):
-                    song_name = song[new_df.columns[0]]
-                    artist = song.get('Album/Movie', 'Unknown')
-                    rating = song.get('User-Rating', 'N/A')
+                for idx, song in enumerate(mood_songs):
+                    song_name = song['title']
+                    artist = song['artist']
+                    rating = 'N/A' if song['rating'] is None else song['rating']
                     
                     col1, col2 = st.columns([3, 1])
                     with col1:
@@ -707,26 +796,41 @@ with tab3:
             else:
                 st.warning(f"No {selected_quick_mood} songs found!")
 
-with tab4:
+with tab4, metrics.timer("render.favorites"):
     # Favorites Management
     st.subheader("⭐ Your Favorite Songs")
     
-    if st.session_state.favorites:
-        st.success(f"You have {len(st.session_state.favorites)} favorite songs!")
+    if user_data.favorites:
+        st.success(f"You have {len(user_data.favorites)} favorite songs!")
+        
+        # Personalized feed from every favorite and recent play in one pass
+        feed = recommend_for_you()
+        if feed:
+            st.markdown("### 🎯 Made For You")
+            for i, rec in enumerate(feed, 1):
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    st.write(f"**{i}. {rec['title']}** - {rec['artist']}")
+                    st.write(f"🎭 {rec['mood']} | ⭐ {rec['rating']} | {rec['similarity']} match")
+                with col2:
+                    if st.button("▶️ Play", key=f"feed_play_{rec['title']}"):
+                        play_song_on_youtube(rec['title'], rec['artist'])
+            st.markdown("---")
         
-        for fav in st.session_state.favorites:
+        favorites = list(user_data.favorites)
+        start, end = paginate("favorites", len(favorites))
+        for fav in favorites[start:end]:
             # Find the favorite song in dataset
-            song_col = new_df.columns[0]
-            song_data = new_df[new_df[song_col] == fav]
+            row_id = catalog.row_of(fav)
             
-            if not song_data.empty:
-                row = song_data.iloc[0]
-                display_song_card(row, show_favorite=False)
+            if row_id is not None:
+                display_song_card(service.songs(catalog, [row_id])[0], show_favorite=False,
+                                  key_prefix="favorites_")
                 
                 col1, col2 = st.columns([1, 1])
                 with col1:
                     if st.button(f"❌ Remove {fav}", key=f"remove_{fav}"):
-                        st.session_state.favorites.remove(fav)
+                        remove_favorite(fav)
                         st.success(f"Removed {fav} from favorites!")
                         st.rerun()
                 with col2:
@@ -736,7 +840,7 @@ with tab4:
             else:
                 st.write(f"🎵 {fav} (Not in current dataset)")
                 if st.button(f"❌ Remove {fav}", key=f"remove_{fav}"):
-                    st.session_state.favorites.remove(fav)
+                    remove_favorite(fav)
                     st.rerun()
             st.markdown("---")
     else:
@@ -744,18 +848,16 @@ with tab4:
         
         # Suggest some popular songs to add
         st.subheader("💡 Popular Songs to Start With:")
-        popular_songs = new_df.nlargest(3, 'User-Rating') if 'User-Rating' in new_df.columns else new_df.head(3)
-        for _, song in popular_songs.iterrows():
-            song_name = song[new_df.columns[0]]
-            artist = song.get('Album/Movie', 'Unknown')
+        for song in service.songs(catalog, catalog.top_rated(3)):
+            song_name = song['title']
+            artist = song['artist']
             st.write(f"🎵 **{song_name}** - {artist}")
             if st.button(f"❤️ Add {song_name}", key=f"add_pop_{song_name}"):
-                if song_name not in st.session_state.favorites:
-                    st.session_state.favorites.append(song_name)
+                if add_favorite(song_name):
                     st.success(f"Added {song_name} to favorites!")
                     st.rerun()
 
-with tab5:
+with tab5, metrics.timer("render.analytics"):
     # Analytics Tab
     st.subheader("📊 Music Analytics")
     
@@ -765,40 +867,34 @@ with tab5:
         st.markdown("### 🎵 Music Statistics")
         
         # Basic stats
-        if 'Genre' in new_df.columns:
-            genre_counts = new_df['Genre'].value_counts().head(8)
+        if catalog.stats['genres'] is not None:
             st.subheader("🎼 Top Genres")
-            for genre, count in genre_counts.items():
+            for genre, count in catalog.stats['genres'][:8]:
                 st.write(f"**{genre}**: {count} songs")
         
         st.markdown("---")
         
         # Rating distribution
-        if 'User-Rating' in new_df.columns:
+        rating_stats = catalog.stats['rating']
+        if rating_stats:
             st.subheader("⭐ Rating Statistics")
-            rating_stats = new_df['User-Rating'].describe()
             st.write(f"**Average Rating**: {rating_stats['mean']:.1f}/10")
             st.write(f"**Highest Rating**: {rating_stats['max']}/10")
             st.write(f"**Lowest Rating**: {rating_stats['min']}/10")
-            st.write(f"**Total Rated Songs**: {len(new_df)}")
+            st.write(f"**Total Rated Songs**: {rating_stats['count']}")
     
     with col2:
         st.markdown("### 👤 Your Music Profile")
         
         # User listening habits
-        if st.session_state.play_history:
+        if user_data.history:
             st.write("**Your Recent Listening Pattern:**")
             # Simple analysis based on played songs
-            recent_moods = []
-            for song in st.session_state.play_history[-10:]:
-                song_data = new_df[new_df[new_df.columns[0]] == song]
-                if not song_data.empty and 'Mood' in song_data.columns:
-                    recent_moods.append(song_data.iloc[0]['Mood'])
+            recent_moods = user_profile().top_moods()
             
             if recent_moods:
-                mood_counts = pd.Series(recent_moods).value_counts()
                 st.subheader("🎭 Your Recent Mood Preferences")
-                for mood, count in mood_counts.items():
+                for mood, count in recent_moods:
                     st.write(f"**{mood}**: {count} songs")
             else:
                 st.info("Play some songs to see your mood preferences!")
@@ -808,22 +904,43 @@ with tab5:
         st.markdown("---")
         
         st.markdown("### 🏆 Your Top Genres")
-        if st.session_state.favorites:
-            favorite_genres = []
-            for fav in st.session_state.favorites:
-                song_data = new_df[new_df[new_df.columns[0]] == fav]
-                if not song_data.empty and 'Genre' in song_data.columns:
-                    favorite_genres.append(song_data.iloc[0]['Genre'])
+        if user_data.favorites:
+            favorite_genres = user_profile().top_genres(5)
             
             if favorite_genres:
-                genre_counts = pd.Series(favorite_genres).value_counts().head(5)
-                for genre, count in genre_counts.items():
+                for genre, count in favorite_genres:
                     st.write(f"**{genre}**: {count} songs")
             else:
                 st.info("Add favorite songs to see your genre preferences!")
         else:
             st.info("No favorites yet. Add some songs to see your preferences!")
 
+fill_pending_posters()
+
 # Footer
 st.markdown("---")
-st.markdown("<center>🎵 **MRS Punjabi v4.0 Pro** | ✨ **AI-Powered Music Discovery** | 👨‍💻 **Developed by Gursimran Singh** | 🏫 **AUP Mohali**</center>", unsafe_allow_html=True)
\ No newline at end of file
+st.markdown("<center>🎵 **MRS Punjabi v4.0 Pro** | ✨ **AI-Powered Music Discovery** | 👨‍💻 **Developed by Gursimran Singh** | 🏫 **AUP Mohali**</center>", unsafe_allow_html=True)
+
+rerun_spans = metrics.finish_rerun()
+
+# -------------------- DEBUG PANEL --------------------
+# Enabled with MRS_DEBUG=1 or ?debug=1 in the URL
+if os.environ.get("MRS_DEBUG") == "1" or st.query_params.get("debug") == "1":
+    with st.sidebar.expander("🛠️ Performance", expanded=False):
+        st.markdown("**This rerun (ms)**")
+        st.dataframe(pd.DataFrame({"ms": {k: v * 1000 for k, v in rerun_spans.items()}}).round(2),
+                     use_container_width=True)
+        report = metrics.summary()
+        if report["timers"]:
+            st.markdown("**Since start (ms)**")
+            timers = pd.DataFrame(report["timers"]).T
+            timers[["total", "p50", "p95", "max"]] *= 1000
+            st.dataframe(timers.round(2), use_container_width=True)
+        if report["counters"]:
+            st.markdown("**Counters**")
+            st.json(report["counters"])
+        cache = service.CACHE.stats()
+        st.markdown(f"**Result cache:** {cache['entries']}/{cache['max_entries']} entries, "
+                    f"{cache['hit_rate']:.0%} hit rate ({cache['hits']} hits, {cache['misses']} misses)")
+        st.download_button("Prometheus text", metrics.prometheus(), file_name="mrs_metrics.prom")
+        st.download_button("JSON", metrics.REGISTRY.to_json(), file_name="mrs_metrics.json")
\ No newline at end of file
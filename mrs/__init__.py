@@ -0,0 +1 @@
+"""Headless model, index and recommendation code behind the MRS Punjabi app"""
@@ -0,0 +1,222 @@
+"""Approximate nearest neighbours for catalogs too big for a neighbour index
+
+Random-projection LSH over the songs' sparse feature vectors: each of
+``n_tables`` tables hashes a song to the sign pattern of ``n_bits``
+random projections. A query collects the songs sharing its bucket in
+every table (plus ``n_probes`` neighbouring buckets per table, flipping
+the least certain bits) and re-ranks those candidates by their exact
+cosine similarity. More tables/probes raise recall, more bits cut
+candidates and latency.
+
+AnnIndex exposes the same ``row()`` / ``n_songs`` interface as
+NeighborIndex, so recommend() works unchanged on either backend. Check
+the trade-off against the exact index with::
+
+    python -m mrs.ann --models models --sample 500 --k 10
+
+``preprocess_data.py --backend ann`` stores the projection planes and the
+sorted bucket codes in the release (``to_arrays``) and the parameters in
+the manifest's ``ann`` entry, so every worker memory-maps the same index
+instead of rebuilding it. The query-time knobs can be overridden per
+deployment with ``MRS_ANN_PROBES`` and ``MRS_ANN_CANDIDATES``.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from mrs import features
+from mrs.engine import top_k
+
+DEFAULT_TABLES = 24
+DEFAULT_BITS = 10
+DEFAULT_PROBES = 3
+DEFAULT_CANDIDATES = 50
+CHUNK_ROWS = 65536
+PROBES_ENV = 'MRS_ANN_PROBES'
+CANDIDATES_ENV = 'MRS_ANN_CANDIDATES'
+ARRAYS = ('ann_planes', 'ann_order', 'ann_codes')
+
+
+def index_params(manifest):
+    """AnnIndex keyword arguments from a release manifest plus env overrides"""
+    params = dict(manifest.get('ann') or {})
+    for name, env in (('n_probes', PROBES_ENV), ('n_neighbors', CANDIDATES_ENV)):
+        if os.environ.get(env):
+            params[name] = int(os.environ[env])
+    return params
+
+
+class AnnIndex:
+    """LSH candidate generation plus exact re-ranking"""
+
+    def __init__(self, matrix, n_tables=DEFAULT_TABLES, n_bits=DEFAULT_BITS, n_probes=DEFAULT_PROBES,
+                 n_neighbors=DEFAULT_CANDIDATES, seed=0, planes=None, order=None, sorted_codes=None):
+        """``planes``, ``order`` and ``sorted_codes`` are a stored index (see to_arrays)"""
+        if n_bits > 62:
+            raise ValueError("n_bits must fit in a 64-bit bucket code")
+        self.matrix = matrix
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.n_probes = n_probes
+        self.n_neighbors = n_neighbors
+        self.seed = seed
+
+        if planes is None:
+            rng = np.random.default_rng(seed)
+            planes = rng.standard_normal((matrix.shape[1], n_tables * n_bits)).astype(np.float32)
+        elif planes.shape != (matrix.shape[1], n_tables * n_bits):
+            raise ValueError(f"stored planes have shape {planes.shape}, expected "
+                             f"{(matrix.shape[1], n_tables * n_bits)} for {n_tables} tables of {n_bits} bits")
+        self.planes = planes
+        self._weights = (1 << np.arange(n_bits, dtype=np.int64))
+
+        if order is None or sorted_codes is None:
+            codes = np.empty((matrix.shape[0], n_tables), dtype=np.int64)
+            for start in range(0, matrix.shape[0], CHUNK_ROWS):
+                codes[start:start + CHUNK_ROWS] = self._codes(self._project(matrix[start:start + CHUNK_ROWS]))
+            order = np.argsort(codes, axis=0, kind='stable')
+            sorted_codes = np.take_along_axis(codes, order, axis=0)
+        self._order = order
+        self._sorted_codes = sorted_codes
+
+    @classmethod
+    def from_arrays(cls, arrays, **params):
+        """Index over a release's feature vectors, reusing its stored planes and codes if any"""
+        matrix = features.from_arrays(arrays, len(arrays['vocabulary']))
+        if all(name in arrays for name in ARRAYS):
+            params.update(planes=arrays['ann_planes'], order=arrays['ann_order'],
+                          sorted_codes=arrays['ann_codes'])
+        return cls(matrix, **params)
+
+    @property
+    def params(self):
+        """Manifest form of this index's parameters"""
+        return {'n_tables': self.n_tables, 'n_bits': self.n_bits, 'n_probes': self.n_probes,
+                'n_neighbors': self.n_neighbors, 'seed': self.seed}
+
+    def to_arrays(self):
+        """Arrays to store in a release so workers mmap the index instead of building it"""
+        return {'ann_planes': self.planes, 'ann_order': self._order, 'ann_codes': self._sorted_codes}
+
+    @property
+    def n_songs(self):
+        return self.matrix.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.planes.nbytes + self._order.nbytes + self._sorted_codes.nbytes
+
+    def _project(self, rows):
+        return np.asarray(rows @ self.planes).reshape(rows.shape[0], self.n_tables, self.n_bits)
+
+    def _codes(self, projections):
+        return (projections > 0).astype(np.int64) @ self._weights
+
+    def _probe_codes(self, projection):
+        """Bucket codes to visit per table: the song's own plus its closest flips"""
+        base = self._codes(projection[None])[0]
+        probes = [base]
+        if self.n_probes:
+            uncertain = np.argsort(np.abs(projection), axis=1)[:, :self.n_probes]
+            for j in range(uncertain.shape[1]):
+                probes.append(base ^ (np.int64(1) << uncertain[:, j].astype(np.int64)))
+        return np.stack(probes, axis=1)
+
+    def candidates(self, i):
+        projection = self._project(self.matrix[i])[0]
+        found = []
+        for table, codes in enumerate(self._probe_codes(projection)):
+            column = self._sorted_codes[:, table]
+            lo = np.searchsorted(column, codes, side='left')
+            hi = np.searchsorted(column, codes, side='right')
+            found.extend(self._order[a:b, table] for a, b in zip(lo, hi) if b > a)
+        if not found:
+            return np.empty(0, dtype=np.intp)
+        found = np.unique(np.concatenate(found))
+        return found[found != i]
+
+    def row(self, i):
+        """(neighbour indices, scores) for song ``i``, ascending by index"""
+        cands = self.candidates(i)
+        if not len(cands):
+            return np.empty(0, np.int32), np.empty(0, np.float32)
+        scores = np.asarray((self.matrix[cands] @ self.matrix[i].T).todense()).ravel().astype(np.float32)
+        best = top_k(scores, self.n_neighbors)
+        best = best[np.argsort(cands[best])]
+        return cands[best].astype(np.int32), scores[best]
+
+
+def exact_row(matrix, i, k):
+    """Exact top-k (indices, scores) for one song by brute force"""
+    scores = np.asarray((matrix @ matrix[i].T).todense()).ravel().astype(np.float32)
+    idx = top_k(scores, k, exclude=i)
+    return idx, scores[idx]
+
+
+def recall_at_k(ann, matrix, sample, k):
+    """Mean recall@k and per-query latencies of ``ann`` against brute force
+
+    Tie-aware: an ANN hit counts if its exact score reaches the exact k-th
+    best, so equally similar songs are interchangeable.
+    """
+    recalls, latencies = [], []
+    for i in sample:
+        _, exact_scores = exact_row(matrix, i, k)
+        if not len(exact_scores):
+            continue
+        started = time.perf_counter()
+        idx, scores = ann.row(i)
+        latencies.append(time.perf_counter() - started)
+        best = np.sort(scores)[::-1][:k]
+        recalls.append(np.count_nonzero(best >= exact_scores[-1] - 1e-6) / len(exact_scores))
+    return float(np.mean(recalls)), np.asarray(latencies)
+
+
+def benchmark(matrix, sample_size=500, k=10, configs=None, seed=0, report=print):
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(matrix.shape[0], size=min(sample_size, matrix.shape[0]), replace=False)
+
+    exact_latency = []
+    for i in sample[:min(len(sample), 50)]:
+        started = time.perf_counter()
+        exact_row(matrix, i, k)
+        exact_latency.append(time.perf_counter() - started)
+    report(f"exact brute force: p50 {np.percentile(exact_latency, 50) * 1000:.2f} ms, "
+           f"p95 {np.percentile(exact_latency, 95) * 1000:.2f} ms")
+
+    results = []
+    for params in configs or [dict(n_tables=t, n_bits=b, n_probes=p)
+                              for t, b, p in [(8, 8, 2), (16, 8, 2), (24, 10, 3), (32, 12, 4)]]:
+        started = time.perf_counter()
+        ann = AnnIndex(matrix, n_neighbors=k, seed=seed, **params)
+        build = time.perf_counter() - started
+        recall, latency = recall_at_k(ann, matrix, sample, k)
+        results.append({**params, 'recall': recall, 'build_seconds': build,
+                        'p50_ms': np.percentile(latency, 50) * 1000, 'p95_ms': np.percentile(latency, 95) * 1000})
+        report(f"tables={params['n_tables']:>2} bits={params['n_bits']:>2} probes={params['n_probes']}: "
+               f"recall@{k} {recall:.3f}, p50 {results[-1]['p50_ms']:.2f} ms, "
+               f"p95 {results[-1]['p95_ms']:.2f} ms, build {build:.1f}s")
+    return results
+
+
+def main(argv=None):
+    from mrs import model_store
+
+    parser = argparse.ArgumentParser(description="Recall@k / latency benchmark of the ANN backend")
+    parser.add_argument('--models', default='models')
+    parser.add_argument('--sample', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    model = model_store.load_model(args.models)
+    if 'vocabulary' not in model.arrays:
+        raise SystemExit("The current release has no feature vectors; build it with preprocess_data.py")
+    matrix = features.from_arrays(model.arrays, len(model.arrays['vocabulary']))
+    print(f"{matrix.shape[0]} songs, {matrix.shape[1]} features")
+    benchmark(matrix, sample_size=args.sample, k=args.k)
+
+
+if __name__ == '__main__':
+    main()
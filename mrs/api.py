@@ -0,0 +1,307 @@
+"""Async HTTP JSON API over mrs.service
+
+    python -m mrs.api --models models --port 8080
+
+Endpoints (all GET unless noted; JSON in, JSON out)::
+
+    /health                                  status and live model version
+    /recommend?title=Excuses&n=5             songs like one title
+    POST /recommend  {"titles": [...], "n": 5}  unknown titles map to {"error": ...}
+    POST /for-you    {"favorites": [...], "plays": [...], "n": 5}
+    /search?q=sidhu&page=0&page_size=20
+    /mood?mood=Happy&n=10                    mood=Happy,Chill&match=all for several
+    /playlist?mood=Chill&minutes=30
+    /metrics                                 Prometheus text
+
+Each process holds one ModelRegistry (shared, memory-mapped, hot-reloaded)
+and runs the numpy work on a small thread pool, so the event loop only
+does I/O. Concurrent ``/recommend?title=`` calls that arrive within a
+couple of milliseconds are coalesced into one vectorized engine call. At
+most ``max_concurrency`` requests run at once and ``max_queue`` more may
+wait; beyond that the server answers 503 with Retry-After instead of
+building an unbounded backlog.
+
+The process keeps no per-user state, so any number of them can run
+behind a load balancer. Use ``--reuse-port`` to run several on one host.
+"""
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from mrs import metrics, service
+from mrs.registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8080
+DEFAULT_WORKERS = 4
+MAX_CONCURRENCY = 64
+MAX_QUEUE = 256
+MAX_BATCH = 64
+BATCH_WAIT_SECONDS = 0.002
+MAX_N = 100
+MAX_TITLES = 1000
+
+REGISTRY = web.AppKey('registry', ModelRegistry)
+EXECUTOR = web.AppKey('executor', ThreadPoolExecutor)
+BATCHER = web.AppKey('batcher', object)
+LIMITER = web.AppKey('limiter', object)
+
+
+def _error(cls, message, **kwargs):
+    return cls(text=json.dumps({'error': message}), content_type='application/json', **kwargs)
+
+
+def _bad_request(message):
+    return _error(web.HTTPBadRequest, message)
+
+
+def _int_param(request, name, default, low=0, high=None):
+    raw = request.query.get(name)
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise _bad_request(f"{name} must be an integer")
+    if high is None and value < low:
+        raise _bad_request(f"{name} must be at least {low}")
+    if value < low or (high is not None and value > high):
+        raise _bad_request(f"{name} must be between {low} and {high}")
+    return value
+
+
+def _required(request, name):
+    value = request.query.get(name, '').strip()
+    if not value:
+        raise _bad_request(f"missing '{name}' parameter")
+    return value
+
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise _bad_request("body must be JSON")
+    if not isinstance(body, dict):
+        raise _bad_request("body must be a JSON object")
+    return body
+
+
+class Limiter:
+    """At most ``concurrency`` requests running and ``queue`` waiting"""
+
+    def __init__(self, concurrency=MAX_CONCURRENCY, queue=MAX_QUEUE):
+        self.capacity = concurrency + queue
+        self.inflight = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        if request.path in ('/health', '/metrics'):
+            return await handler(request)
+        if self.inflight >= self.capacity:
+            metrics.incr('api.rejected')
+            raise _error(web.HTTPServiceUnavailable, "overloaded", headers={'Retry-After': '1'})
+        self.inflight += 1
+        try:
+            async with self._semaphore:
+                with metrics.timer(f'api.{request.path.strip("/") or "root"}'):
+                    return await handler(request)
+        finally:
+            self.inflight -= 1
+
+
+class RecommendBatcher:
+    """Coalesces concurrent single-title recommendations into one engine call"""
+
+    def __init__(self, registry, executor, max_batch=MAX_BATCH, max_wait=BATCH_WAIT_SECONDS):
+        self.registry = registry
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+
+    async def recommend(self, title, topn):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((title, topn, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            metrics.incr('api.recommend_batches')
+            metrics.incr('api.recommend_batched', len(batch))
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results, version = await loop.run_in_executor(self.executor, self._recommend_batch, batch)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result((result, version))
+
+    def _recommend_batch(self, batch):
+        catalog = self.registry.current()
+        results = [None] * len(batch)
+        by_topn = {}
+        for i, (title, topn, _) in enumerate(batch):
+            by_topn.setdefault(topn, []).append(i)
+        # One vectorized call per distinct n
+        for topn, positions in by_topn.items():
+            ranked = service.recommend_many(catalog, [batch[i][0] for i in positions], topn)
+            for i, songs in zip(positions, ranked):
+                # None marks a title the catalog doesn't have
+                results[i] = songs if catalog.row_of(batch[i][0]) is not None else None
+        return results, catalog.version
+
+
+def _recommend_titles(catalog, titles, topn):
+    """{title: songs} for a batch, with an error entry for each unknown title"""
+    results = service.recommend_many(catalog, titles, topn)
+    return {title: songs if catalog.row_of(title) is not None else {'error': "unknown title"}
+            for title, songs in zip(titles, results)}
+
+
+async def _in_pool(request, func, *args):
+    """Run ``func(catalog, *args)`` on the worker pool against the live model"""
+    catalog = request.app[REGISTRY].current()
+    result = await asyncio.get_running_loop().run_in_executor(request.app[EXECUTOR], func, catalog, *args)
+    return result, catalog.version
+
+
+async def health(request):
+    return web.json_response({'status': 'ok', 'version': request.app[REGISTRY].version})
+
+
+async def recommend(request):
+    title = _required(request, 'title')
+    topn = _int_param(request, 'n', service.DEFAULT_TOPN, 1, MAX_N)
+    songs, version = await request.app[BATCHER].recommend(title, topn)
+    if songs is None:
+        raise _error(web.HTTPNotFound, "unknown title")
+    return web.json_response({'version': version, 'title': title, 'results': songs})
+
+
+async def recommend_batch(request):
+    body = await _json_body(request)
+    titles = body.get('titles')
+    if not isinstance(titles, list) or not titles or len(titles) > MAX_TITLES:
+        raise _bad_request(f"'titles' must be a list of 1 to {MAX_TITLES} titles")
+    topn = body.get('n', service.DEFAULT_TOPN)
+    if not isinstance(topn, int) or not 1 <= topn <= MAX_N:
+        raise _bad_request(f"n must be between 1 and {MAX_N}")
+    results, version = await _in_pool(request, _recommend_titles, [str(t) for t in titles], topn)
+    return web.json_response({'version': version, 'results': results})
+
+
+async def for_you(request):
+    body = await _json_body(request)
+    favorites, plays = body.get('favorites', []), body.get('plays', [])
+    if not isinstance(favorites, list) or not isinstance(plays, list):
+        raise _bad_request("'favorites' and 'plays' must be lists")
+    topn = body.get('n', service.DEFAULT_TOPN)
+    if not isinstance(topn, int) or not 1 <= topn <= MAX_N:
+        raise _bad_request(f"n must be between 1 and {MAX_N}")
+    songs, version = await _in_pool(request, service.recommend_for_you, [str(t) for t in favorites],
+                                    [str(t) for t in plays], topn)
+    return web.json_response({'version': version, 'results': songs})
+
+
+async def search(request):
+    query = _required(request, 'q')
+    page = _int_param(request, 'page', 0)
+    page_size = _int_param(request, 'page_size', 20, 1, MAX_N)
+    result, version = await _in_pool(request, service.search, query, page, page_size)
+    return web.json_response({'version': version, **result})
+
+
+async def mood(request):
+    name = _required(request, 'mood')
+    topn = _int_param(request, 'n', 10, 1, MAX_N)
+    match = request.query.get('match', 'any')
+    if match not in ('any', 'all'):
+        raise _bad_request("match must be 'any' or 'all'")
+    moods = [m.strip() for m in name.split(',') if m.strip()]
+    query = moods[0] if len(moods) == 1 else moods
+    songs, version = await _in_pool(request, service.mood, query, topn, match)
+    return web.json_response({'version': version, 'mood': name, 'match': match, 'results': songs})
+
+
+async def playlist(request):
+    name = _required(request, 'mood')
+    minutes = _int_param(request, 'minutes', 30, 1, 600)
+    result, version = await _in_pool(request, service.playlist, name, minutes)
+    return web.json_response({'version': version, **result})
+
+
+async def prometheus(request):
+    return web.Response(text=metrics.prometheus(), content_type='text/plain')
+
+
+def create_app(registry, workers=DEFAULT_WORKERS, max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE):
+    """aiohttp application serving ``registry``'s live model"""
+    limiter = Limiter(max_concurrency, max_queue)
+    app = web.Application(middlewares=[limiter.middleware])
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+    app[REGISTRY] = registry
+    service.CACHE.watch(registry)
+    app[EXECUTOR] = executor
+    app[LIMITER] = limiter
+    app[BATCHER] = RecommendBatcher(registry, executor)
+    app.router.add_get('/health', health)
+    app.router.add_get('/recommend', recommend)
+    app.router.add_post('/recommend', recommend_batch)
+    app.router.add_post('/for-you', for_you)
+    app.router.add_get('/search', search)
+    app.router.add_get('/mood', mood)
+    app.router.add_get('/playlist', playlist)
+    app.router.add_get('/metrics', prometheus)
+
+    async def shutdown(app):
+        executor.shutdown(wait=False, cancel_futures=True)
+        registry.stop()
+
+    app.on_cleanup.append(shutdown)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve recommendations over HTTP")
+    parser.add_argument('--models', default='models')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="threads for model work")
+    parser.add_argument('--max-concurrency', type=int, default=MAX_CONCURRENCY)
+    parser.add_argument('--max-queue', type=int, default=MAX_QUEUE)
+    parser.add_argument('--reuse-port', action='store_true',
+                        help="let several processes on this host share the port")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    registry = ModelRegistry(args.models)
+    app = create_app(registry, args.workers, args.max_concurrency, args.max_queue)
+    web.run_app(app, host=args.host, port=args.port, reuse_port=args.reuse_port or None)
+
+
+if __name__ == '__main__':
+    main()
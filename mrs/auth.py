@@ -0,0 +1,257 @@
+"""Password authentication and session tokens
+
+Passwords are stored as salted PBKDF2-SHA256 hashes in the same SQLite
+file as the user data (see mrs.user_store)::
+
+    pbkdf2_sha256$<iterations>$<salt>$<hash>
+
+Hashing is deliberately slow. ``hashlib.pbkdf2_hmac`` releases the GIL,
+so ``submit_login`` runs it on a thread pool sized to the machine's cores,
+off the UI thread, and concurrent logins use several cores instead of
+queueing behind each other.
+
+A successful login issues a random session token. Only the token's SHA-256
+is stored, so a copy of the database cannot be replayed. The token lets a
+new browser session skip the password until it expires or is revoked.
+
+No account exists until one is created. Create users, the documented demo
+login, or measure login throughput with::
+
+    python -m mrs.auth add-user alice
+    python -m mrs.auth seed-demo
+    python -m mrs.auth bench --logins 64 --workers 8
+"""
+import argparse
+import base64
+import getpass
+import hashlib
+import hmac
+import os
+import secrets
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mrs.user_store import DEFAULT_PATH, connect
+
+ALGORITHM = 'pbkdf2_sha256'
+ITERATIONS = 600_000
+SALT_BYTES = 16
+TOKEN_TTL_SECONDS = 30 * 24 * 3600
+# PBKDF2 is CPU-bound: more hashing threads than cores only adds queueing
+DEFAULT_WORKERS = os.cpu_count() or 1
+# Only created on request (seed-demo, or MRS_DEMO_USERS=1 for the app); never in production
+DEMO_USERS = {'gursimran': '12345'}
+DEMO_ENV = 'MRS_DEMO_USERS'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS credentials (
+    user TEXT PRIMARY KEY,
+    password_hash TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    token_hash TEXT PRIMARY KEY,
+    user TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+class AuthError(Exception):
+    """Raised for invalid user names or passwords when creating users"""
+
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def hash_password(password, salt=None, iterations=ITERATIONS):
+    """Encoded salted PBKDF2 hash of ``password``"""
+    salt = salt or os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password, encoded):
+    """Constant-time check of ``password`` against an encoded hash"""
+    try:
+        algorithm, iterations, salt, expected = encoded.split('$')
+        iterations = int(iterations)
+    except ValueError:
+        return False
+    if algorithm != ALGORITHM:
+        return False
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), base64.b64decode(salt), iterations)
+    return hmac.compare_digest(digest, base64.b64decode(expected))
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class Authenticator:
+    """Credentials store, off-thread password checks and session tokens"""
+
+    def __init__(self, path=DEFAULT_PATH, max_workers=DEFAULT_WORKERS, iterations=ITERATIONS,
+                 token_ttl=TOKEN_TTL_SECONDS):
+        self.path = path
+        self.iterations = iterations
+        self.token_ttl = token_ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = connect(path)
+        conn.executescript(SCHEMA)
+        conn.close()
+        self._local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='auth')
+        # Unknown users are checked against this so they take as long as real ones
+        self._dummy_hash = hash_password(secrets.token_hex(8), iterations=iterations)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return conn
+
+    # -- users --
+
+    def create_user(self, user, password, replace=False):
+        if not user or not user.strip():
+            raise AuthError("user name must not be empty")
+        if not password:
+            raise AuthError("password must not be empty")
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        cursor = self._conn().execute(
+            f"{verb} INTO credentials (user, password_hash, created) VALUES (?, ?, ?)",
+            (user, hash_password(password, iterations=self.iterations), time.time()))
+        if not cursor.rowcount:
+            raise AuthError(f"user {user!r} already exists")
+
+    def has_user(self, user):
+        return self._conn().execute("SELECT 1 FROM credentials WHERE user = ?", (user,)).fetchone() is not None
+
+    def seed_demo_users(self):
+        """Create the documented demo login(s); for local demos only"""
+        for user, password in DEMO_USERS.items():
+            if not self.has_user(user):
+                self.create_user(user, password)
+
+    def verify(self, user, password):
+        """True if the password matches; blocking, so prefer ``submit_login``"""
+        row = self._conn().execute("SELECT password_hash FROM credentials WHERE user = ?", (user,)).fetchone()
+        if row is None:
+            verify_password(password, self._dummy_hash)
+            return False
+        return verify_password(password, row[0])
+
+    # -- logins and tokens --
+
+    def submit_login(self, user, password):
+        """Future resolving to a new session token, or None for bad credentials"""
+        return self.executor.submit(self._login, user, password)
+
+    def login(self, user, password):
+        return self.submit_login(user, password).result()
+
+    def _login(self, user, password):
+        return self.issue_token(user) if self.verify(user, password) else None
+
+    def issue_token(self, user):
+        token = secrets.token_urlsafe(32)
+        self._conn().execute("INSERT INTO sessions (token_hash, user, expires) VALUES (?, ?, ?)",
+                             (_token_hash(token), user, time.time() + self.token_ttl))
+        return token
+
+    def user_for_token(self, token):
+        """User a live token belongs to, or None"""
+        if not token:
+            return None
+        row = self._conn().execute("SELECT user, expires FROM sessions WHERE token_hash = ?",
+                                   (_token_hash(token),)).fetchone()
+        if row is None:
+            return None
+        user, expires = row
+        if expires < time.time():
+            self.revoke(token)
+            return None
+        return user
+
+    def revoke(self, token):
+        if token:
+            self._conn().execute("DELETE FROM sessions WHERE token_hash = ?", (_token_hash(token),))
+
+    def purge_expired(self):
+        return self._conn().execute("DELETE FROM sessions WHERE expires < ?", (time.time(),)).rowcount
+
+    def revoke_all(self):
+        """Sign every session out"""
+        return self._conn().execute("DELETE FROM sessions").rowcount
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def benchmark(logins=64, workers=DEFAULT_WORKERS, iterations=ITERATIONS):
+    """Logins per second run one at a time and through the worker pool"""
+    with tempfile.TemporaryDirectory() as tmp:
+        auth = Authenticator(os.path.join(tmp, 'auth.db'), max_workers=workers, iterations=iterations)
+        auth.create_user('bench', 'secret')
+        try:
+            started = time.perf_counter()
+            for _ in range(logins):
+                auth._login('bench', 'secret')
+            serial = logins / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            futures = [auth.submit_login('bench', 'secret') for _ in range(logins)]
+            ok = sum(f.result() is not None for f in futures)
+            pooled = logins / (time.perf_counter() - started)
+        finally:
+            auth.close()
+    return {'logins': logins, 'workers': workers, 'iterations': iterations, 'succeeded': ok,
+            'serial_per_second': serial, 'pooled_per_second': pooled}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage users and benchmark logins")
+    parser.add_argument('--db', default=os.environ.get('MRS_USER_DB', DEFAULT_PATH))
+    sub = parser.add_subparsers(dest='command', required=True)
+    add = sub.add_parser('add-user', help="create a user (prompts for the password)")
+    add.add_argument('user')
+    add.add_argument('--replace', action='store_true', help="reset an existing user's password")
+    sub.add_parser('seed-demo', help="create the demo login (local demos only)")
+    purge = sub.add_parser('purge', help="delete expired session tokens")
+    purge.add_argument('--all', action='store_true', help="delete every session token (signs everyone out)")
+    bench = sub.add_parser('bench', help="measure login throughput")
+    bench.add_argument('--logins', type=int, default=64)
+    bench.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="hashing threads")
+    bench.add_argument('--iterations', type=int, default=ITERATIONS)
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        result = benchmark(args.logins, args.workers, args.iterations)
+        print(f"{result['logins']} logins, {result['iterations']} PBKDF2 iterations: "
+              f"{result['serial_per_second']:.1f}/s serial, "
+              f"{result['pooled_per_second']:.1f}/s on {result['workers']} workers")
+        return
+    auth = Authenticator(args.db)
+    if args.command == 'add-user':
+        password = getpass.getpass(f"Password for {args.user}: ")
+        try:
+            auth.create_user(args.user, password, replace=args.replace)
+        except AuthError as e:
+            parser.exit(1, f"error: {e}\n")
+        print(f"Saved credentials for {args.user}")
+    elif args.command == 'seed-demo':
+        auth.seed_demo_users()
+        print(f"Demo login ready: {', '.join(DEMO_USERS)}")
+    elif args.command == 'purge':
+        removed = auth.revoke_all() if args.all else auth.purge_expired()
+        print(f"Removed {removed} {'' if args.all else 'expired '}sessions")
+
+
+if __name__ == '__main__':
+    main()
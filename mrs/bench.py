@@ -0,0 +1,291 @@
+"""Headless benchmarks of the app's hot paths on synthetic catalogs
+
+Generates a catalog with the real column layout, and a random top-K
+neighbour index, at each requested size. It then times the code paths
+behind the Streamlit views, without Streamlit:
+
+    recommend          engine.recommend_rows for one song
+    recommend_for_you  engine.recommend_for_seeds over favorites + plays
+    search             SearchIndex.search with distinct (uncached) queries
+    mood               mood_index.top, as get_mood_recommendations
+    playlist           build_playlist over a mood bucket, as the Mood tab
+
+It also records one-off setup costs: the Catalog, search index, mood index
+and durations. Latency percentiles come from untraced runs. Peak memory
+comes from a separate pass under tracemalloc, because tracing slows the
+code down. Each size is generated from a fixed seed, so results stay
+comparable between runs::
+
+    python -m mrs.bench --sizes 10000 100000 --out bench.json
+    python -m mrs.bench --sizes 10000 --compare bench.json   # flag regressions
+"""
+import argparse
+import json
+import platform
+import resource
+import string
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from mrs import engine
+from mrs.catalog import Catalog
+from mrs.neighbors import DEFAULT_K, NeighborIndex
+from mrs.playlist import DEFAULT_POOL, build_playlist
+
+DEFAULT_SIZES = (10_000, 100_000)
+DEFAULT_REPEAT = 200
+GENRES = ['Pop', 'Hip Hop', 'Desi Hip Hop', 'Bhangra', 'Folk', 'Romantic', 'Sufi', 'Devotional']
+MOODS = ['Energetic', 'Chill', 'Romantic', 'Happy', 'Sad', 'Serious', 'Party', 'Workout']
+SYLLABLES = ['ja', 'tt', 'mun', 'de', 'pya', 'ar', 'dil', 'sohn', 'iye', 'gal', 'laa', 'kur',
+             'ree', 'yaar', 'raa', 'ni', 'bal', 'le', 'shon', 'ki', 'na', 'sa', 'ha', 'ban']
+
+
+def _words(rng, n, min_syllables=2, max_syllables=4):
+    counts = rng.integers(min_syllables, max_syllables + 1, size=n)
+    picks = rng.integers(0, len(SYLLABLES), size=counts.sum())
+    words, start = [], 0
+    for count in counts:
+        words.append(''.join(SYLLABLES[i] for i in picks[start:start + count]))
+        start += count
+    return np.array(words, dtype=object)
+
+
+def synthetic_catalog(n, seed=0):
+    """DataFrame with the bundled catalog's columns plus a Duration column"""
+    rng = np.random.default_rng(seed)
+    vocabulary = _words(rng, max(200, n // 10))
+    first = vocabulary[rng.integers(0, len(vocabulary), size=n)]
+    second = vocabulary[rng.integers(0, len(vocabulary), size=n)]
+    titles = np.where(rng.random(n) < 0.5, first, first + ' ' + second)
+    # Keep titles unique, as the app looks songs up by title
+    suffix = np.char.add(' ', np.arange(n).astype(str)).astype(object)
+    titles = np.where(pd.Series(titles).duplicated().to_numpy(), titles + suffix, titles)
+
+    artists = np.array([f"{a.title()} {b.title()}" for a, b in
+                        zip(_words(rng, max(10, n // 20)), _words(rng, max(10, n // 20)))], dtype=object)
+    artist = artists[rng.integers(0, len(artists), size=n)]
+    seconds = rng.integers(150, 330, size=n)
+    return pd.DataFrame({
+        'Song-Name': [str(t).title() for t in titles],
+        'Album/Movie': artist,
+        'Genre': np.array(GENRES, dtype=object)[rng.integers(0, len(GENRES), size=n)],
+        'User-Rating': np.round(rng.uniform(3.0, 5.0, size=n), 1),
+        'Singer/Artists': artist,
+        'Mood': np.array(MOODS, dtype=object)[rng.integers(0, len(MOODS), size=n)],
+        'Duration': [f"{s // 60}:{s % 60:02d}" for s in seconds],
+    })
+
+
+def synthetic_neighbors(n, k=DEFAULT_K, seed=0, chunk_rows=65536):
+    """Random top-K neighbour index with the same layout and dtypes as a real one"""
+    rng = np.random.default_rng(seed + 1)
+    k = min(k, max(n - 1, 0))
+    indices = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, chunk_rows):
+        end = min(n, start + chunk_rows)
+        indices[start:end] = np.sort(rng.integers(0, n, size=(end - start, k), dtype=np.int32), axis=1)
+        scores[start:end] = rng.random((end - start, k), dtype=np.float32)
+    indptr = np.arange(0, n * k + 1, k, dtype=np.int64) if k else np.zeros(n + 1, dtype=np.int64)
+    return NeighborIndex(indptr, indices.ravel(), scores.ravel())
+
+
+def search_queries(catalog, count, seed=0):
+    """Distinct queries: whole titles, prefixes, artist names and one-letter typos"""
+    rng = np.random.default_rng(seed + 2)
+    titles = catalog.titles[rng.integers(0, len(catalog), size=count)]
+    artists = catalog.values('artist', rng.integers(0, len(catalog), size=count), default='')
+    queries = []
+    for i, (title, artist) in enumerate(zip(titles, artists)):
+        kind = i % 4
+        if kind == 0:
+            queries.append(title)
+        elif kind == 1:
+            queries.append(title.split()[0][:3])
+        elif kind == 2:
+            queries.append(artist)
+        else:
+            word = title.split()[0].lower()
+            pos = int(rng.integers(0, len(word)))
+            queries.append(word[:pos] + string.ascii_lowercase[int(rng.integers(0, 26))] + word[pos + 1:])
+    return list(dict.fromkeys(queries))
+
+
+def _time_calls(func, args_list):
+    latencies = np.empty(len(args_list))
+    for i, args in enumerate(args_list):
+        started = time.perf_counter()
+        func(*args)
+        latencies[i] = time.perf_counter() - started
+    return latencies
+
+
+def _peak_memory(func, args_list):
+    """Peak traced allocation (bytes) over a short run of ``func``"""
+    tracemalloc.start()
+    try:
+        for args in args_list:
+            func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _setup_steps(df, neighbors):
+    """One-off costs in the order the registry pays them on a model swap"""
+    holder = {}
+    return [
+        ('setup.catalog', lambda: holder.update(catalog=Catalog.from_frame(df, neighbors, version='bench'))),
+        ('setup.search_index', lambda: holder['catalog'].search_index),
+        ('setup.mood_index', lambda: holder['catalog'].mood_index),
+        ('setup.durations', lambda: holder['catalog'].durations),
+    ], holder
+
+
+def _record(size, name, latencies, peak):
+    return {
+        'size': size, 'path': name, 'calls': len(latencies),
+        'mean_ms': float(latencies.mean() * 1000),
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'peak_kb': peak / 1024,
+    }
+
+
+def run_size(n, repeat=DEFAULT_REPEAT, k=DEFAULT_K, seed=0, report=print):
+    """Benchmark every hot path on one synthetic catalog of ``n`` songs"""
+    rng = np.random.default_rng(seed)
+    results = []
+
+    started = time.perf_counter()
+    df = synthetic_catalog(n, seed)
+    neighbors = synthetic_neighbors(n, k, seed)
+    report(f"[{n}] generated catalog and neighbours in {time.perf_counter() - started:.1f}s")
+
+    # Timed on one catalog, traced on a second so tracing doesn't skew the times
+    timed_steps, holder = _setup_steps(df, neighbors)
+    traced_steps, _ = _setup_steps(df, neighbors)
+    for (name, func), (_, traced) in zip(timed_steps, traced_steps):
+        seconds = _time_calls(func, [()])[0]
+        peak = _peak_memory(traced, [()])
+        results.append({'size': n, 'path': name, 'calls': 1, 'seconds': float(seconds), 'peak_kb': peak / 1024})
+        report(f"[{n}] {name}: {seconds * 1000:.1f} ms, peak {peak / 2**20:.1f} MiB")
+    catalog = holder['catalog']
+    durations, _ = catalog.durations
+
+    def recommend(row):
+        engine.recommend_rows(catalog.neighbors, [row], catalog.ratings_norm, 5)
+
+    def recommend_for_you(seeds):
+        weights = engine.recency_weights(len(seeds))
+        engine.recommend_for_seeds(catalog.neighbors, seeds, catalog.ratings_norm, 5,
+                                   weights=weights, exclude=seeds)
+
+    def search(query):
+        catalog.search_index.search(query, page_size=None)
+
+    def mood(name):
+        catalog.mood_index.top(name, 10)
+
+    def playlist(name, minutes):
+        pool = catalog.mood_index.top(name, DEFAULT_POOL)
+        build_playlist(pool, durations, minutes * 60, catalog.neighbors, catalog.ratings_norm, seed=minutes)
+
+    rows = rng.integers(0, n, size=repeat)
+    paths = [
+        ('recommend', recommend, [(int(r),) for r in rows]),
+        ('recommend_for_you', recommend_for_you,
+         [(rng.integers(0, n, size=20).tolist(),) for _ in range(repeat)]),
+        ('search', search, [(q,) for q in search_queries(catalog, repeat, seed)]),
+        ('mood', mood, [(MOODS[i % len(MOODS)],) for i in range(repeat)]),
+        ('playlist', playlist,
+         [(MOODS[i % len(MOODS)], int(m)) for i, m in enumerate(rng.integers(10, 121, size=max(1, repeat // 4)))]),
+    ]
+    for name, func, args_list in paths:
+        latencies = _time_calls(func, args_list)
+        if name == 'search':
+            # Queries are distinct; clear so the traced pass misses the cache too
+            catalog.search_index._cache.clear()
+        peak = _peak_memory(func, args_list[:max(1, len(args_list) // 10)])
+        results.append(_record(n, name, latencies, peak))
+        r = results[-1]
+        report(f"[{n}] {name}: p50 {r['p50_ms']:.3f} ms, p95 {r['p95_ms']:.3f} ms, "
+               f"p99 {r['p99_ms']:.3f} ms, peak {r['peak_kb']:.0f} KiB ({r['calls']} calls)")
+    return results
+
+
+def environment():
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+
+def run(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, k=DEFAULT_K, seed=0, report=print):
+    results = []
+    for n in sizes:
+        results.extend(run_size(n, repeat=repeat, k=k, seed=seed, report=report))
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        maxrss //= 1024
+    return {'environment': environment(), 'config': {'sizes': list(sizes), 'repeat': repeat, 'k': k, 'seed': seed},
+            'max_rss_kb': maxrss, 'results': results}
+
+
+def compare(current, baseline, threshold=1.25):
+    """(size, path, metric, old, new) rows where ``current`` is slower than ``threshold`` x baseline"""
+    old = {(r['size'], r['path']): r for r in baseline['results']}
+    regressions = []
+    for r in current['results']:
+        before = old.get((r['size'], r['path']))
+        if before is None:
+            continue
+        metric = 'p95_ms' if 'p95_ms' in r else 'seconds'
+        if before.get(metric) and r[metric] > before[metric] * threshold:
+            regressions.append((r['size'], r['path'], metric, before[metric], r[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark recommendation, search and playlist hot paths")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="catalog sizes to generate (e.g. 10000 100000 1000000)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="calls per hot path")
+    parser.add_argument('--k', type=int, default=DEFAULT_K, help="neighbours per song")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="write results as JSON to this file")
+    parser.add_argument('--compare', help="baseline JSON to check for regressions")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="slowdown ratio that counts as a regression")
+    args = parser.parse_args(argv)
+
+    result = run(args.sizes, repeat=args.repeat, k=args.k, seed=args.seed)
+    print(f"max RSS {result['max_rss_kb'] / 1024:.0f} MiB")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"Wrote {args.out}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        for size, path, metric, before, after in regressions:
+            print(f"REGRESSION [{size}] {path} {metric}: {before:.3f} -> {after:.3f}")
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
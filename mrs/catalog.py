@@ -0,0 +1,238 @@
+"""Catalog: the loaded song table plus lookup indexes built once per model
+
+Columns are plain numpy arrays, memory-mapped straight from the release,
+so opening a catalog copies nothing; every index below is built on first
+use.
+"""
+import logging
+import os
+import re
+import zlib
+from functools import cached_property
+
+import numpy as np
+
+from mrs.engine import normalize_ratings
+
+logger = logging.getLogger(__name__)
+
+ARTIST_COLUMN = 'Singer/Artists'
+ALBUM_COLUMN = 'Album/Movie'
+MOOD_COLUMN = 'Mood'
+GENRE_COLUMN = 'Genre'
+# Stand-in length for songs whose duration is unknown, in seconds
+ESTIMATED_DURATION_RANGE = (180, 300)
+# "exact" uses the release's neighbour index, "ann" the LSH index in mrs.ann
+BACKEND_ENV = 'MRS_SIMILARITY_BACKEND'
+BACKENDS = ('exact', 'ann')
+
+
+def find_rating_column(columns):
+    for col in columns:
+        if 'rating' in col.lower():
+            return col
+    return None
+
+
+def find_duration_column(columns):
+    for col in columns:
+        if 'duration' in col.lower() or 'length' in col.lower():
+            return col
+    return None
+
+
+def parse_duration(value):
+    """Seconds from '3:45', '1:02:03' or a plain number of seconds; 0 if unknown"""
+    if value is None:
+        return 0
+    text = str(value).strip()
+    if re.fullmatch(r'\d+(:\d{1,2}){1,2}', text):
+        seconds = 0
+        for part in text.split(':'):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    try:
+        seconds = float(text)
+    except ValueError:
+        return 0
+    return int(seconds) if seconds == seconds else 0
+
+
+def similarity_backend(model):
+    """The backend to serve a release with: MRS_SIMILARITY_BACKEND, else what it was built for
+
+    A request the release cannot honour is logged and the backend it can
+    serve is used instead, rather than quietly answering with nothing.
+    """
+    built = model.manifest.get('similarity_backend', 'exact')
+    backend = os.environ.get(BACKEND_ENV) or built
+    if backend not in BACKENDS:
+        raise ValueError(f"{BACKEND_ENV} must be one of {', '.join(BACKENDS)}, not {backend!r}")
+    if backend == 'exact' and built == 'ann':
+        logger.warning("%s=exact, but release %s was built without a neighbour index; using ann",
+                       BACKEND_ENV, model.version)
+        return 'ann'
+    if backend == 'ann' and 'vocabulary' not in model.arrays:
+        if built == 'ann':
+            raise ValueError(f"release {model.version} was built for ann but has no feature vectors")
+        logger.warning("%s=ann, but release %s has no feature vectors; using the exact neighbour index",
+                       BACKEND_ENV, model.version)
+        return 'exact'
+    return backend
+
+
+def _scalar(value):
+    """numpy scalar -> Python scalar"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+class Catalog:
+    """Song table with O(1) title lookup, resolved column roles and ratings
+
+    ``columns`` maps column names, in order, to one array each. Build it
+    once per loaded model and share it; nothing here mutates the arrays.
+    """
+
+    def __init__(self, columns, neighbors, version='legacy', arrays=None, stats=None):
+        self.columns = columns
+        self.neighbors = neighbors
+        self.version = version
+        self.arrays = arrays or {}
+        self._stored_stats = stats
+
+        columns = list(columns)
+        self.title_col = columns[0]
+        self.artist_col = ARTIST_COLUMN if ARTIST_COLUMN in columns else None
+        # Cards have always shown Album/Movie first, falling back to the singer
+        self.display_artist_col = ALBUM_COLUMN if ALBUM_COLUMN in columns else self.artist_col
+        self.mood_col = MOOD_COLUMN if MOOD_COLUMN in columns else None
+        self.genre_col = GENRE_COLUMN if GENRE_COLUMN in columns else None
+        self.rating_col = find_rating_column(columns)
+
+        titles = self.columns[self.title_col]
+        self.titles = titles if titles.dtype.kind in 'UO' else titles.astype(str)
+
+    @classmethod
+    def from_frame(cls, df, neighbors, **kwargs):
+        """Catalog over an in-memory DataFrame"""
+        return cls({name: df[name].to_numpy() for name in df.columns}, neighbors, **kwargs)
+
+    @classmethod
+    def from_artifacts(cls, model):
+        backend = similarity_backend(model)
+        neighbors = model.neighbors
+        if backend == 'ann':
+            from mrs.ann import AnnIndex, index_params
+            neighbors = AnnIndex.from_arrays(model.arrays, **index_params(model.manifest))
+        return cls(model.columns, neighbors, version=model.version, arrays=model.arrays,
+                   stats=model.manifest.get('stats'))
+
+    @cached_property
+    def df(self):
+        """The catalog as a DataFrame; a full copy, so keep it off hot paths"""
+        import pandas as pd
+        return pd.DataFrame({name: values.astype(object) if values.dtype.kind == 'U' else values
+                             for name, values in self.columns.items()})
+
+    @cached_property
+    def row_by_title(self):
+        row_by_title = {}
+        for i, title in enumerate(self.titles.tolist()):
+            row_by_title.setdefault(str(title), i)
+        return row_by_title
+
+    @cached_property
+    def ratings_norm(self):
+        return normalize_ratings(self.columns[self.rating_col]) if self.rating_col else None
+
+    @cached_property
+    def search_index(self):
+        from mrs.search import SearchIndex
+        return SearchIndex.from_catalog(self)
+
+    @cached_property
+    def mood_index(self):
+        return self._tag_index('mood')
+
+    @cached_property
+    def stats(self):
+        """Catalog aggregates from the release manifest, or computed once here"""
+        stats = self._stored_stats
+        if stats is not None:
+            # Older releases stored a NaN mean when no song was rated
+            if stats.get('rating') and not stats['rating'].get('count'):
+                stats = {**stats, 'rating': None}
+            return stats
+        from mrs.stats import catalog_stats
+        return catalog_stats(self.df)
+
+    @cached_property
+    def durations(self):
+        """Track length in seconds per row (int32) and whether each is real
+
+        Uses the release's durations array or a duration column; songs
+        without one get a stable estimate derived from the title, so the
+        same song always has the same length.
+        """
+        if 'durations' in self.arrays:
+            seconds = np.asarray(self.arrays['durations'], dtype=np.int32)
+        else:
+            duration_col = find_duration_column(self.columns)
+            seconds = np.zeros(len(self), dtype=np.int32)
+            if duration_col:
+                seconds = np.fromiter((parse_duration(v) for v in self.columns[duration_col].tolist()),
+                                      np.int32, len(self))
+        known = seconds > 0
+        low, high = ESTIMATED_DURATION_RANGE
+        estimates = np.fromiter((low + zlib.crc32(str(t).encode('utf-8')) % (high - low + 1)
+                                 for t in self.titles.tolist()),
+                                np.int32, len(self))
+        return np.where(known, seconds, estimates), known
+
+    def top_rated(self, n=10):
+        """Row ids of the n best rated songs, from the release's precomputed list"""
+        rows = self.stats.get('top_rated')
+        if rows is None or len(rows) < min(n, len(self)):
+            from mrs.stats import top_rated_rows
+            rows = top_rated_rows(self.columns[self.rating_col], n) if self.rating_col else range(len(self))
+        return list(rows[:n])
+
+    def _tag_index(self, role):
+        from mrs.tag_index import TagIndex
+        values = self.values(role, np.arange(len(self)), default=None)
+        ratings = self.columns[self.rating_col] if self.rating_col else None
+        return TagIndex(values, ratings)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def row_of(self, title):
+        """Row id of the first song with this title, or None"""
+        return self.row_by_title.get(str(title))
+
+    def rows_of(self, titles):
+        """Row ids for the titles that are in the catalog, in order"""
+        rows = (self.row_of(t) for t in titles)
+        return [r for r in rows if r is not None]
+
+    def row(self, i):
+        """One song as {column name: value}"""
+        return {name: _scalar(values[i]) for name, values in self.columns.items()}
+
+    def column(self, role):
+        """Column name for a role: title, artist, album, mood, genre or rating"""
+        return {
+            'title': self.title_col,
+            'artist': self.artist_col,
+            'album': self.display_artist_col,
+            'mood': self.mood_col,
+            'genre': self.genre_col,
+            'rating': self.rating_col,
+        }[role]
+
+    def values(self, role, rows, default='Unknown'):
+        """Values of a role's column for the given row ids"""
+        col = self.column(role)
+        if col is None:
+            return [default] * len(rows)
+        return self.columns[col][np.asarray(rows, dtype=np.intp)].tolist()
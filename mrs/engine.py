@@ -0,0 +1,107 @@
+"""Vectorized top-k recommendation engine"""
+import numpy as np
+
+SIMILARITY_WEIGHT = 0.7
+RATING_WEIGHT = 0.3
+
+
+def normalize_ratings(values):
+    """Scale a rating column to [0, 1]; missing ratings count as 0"""
+    ratings = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+    peak = ratings.max() if ratings.size else 0.0
+    if peak <= 0:
+        return np.zeros(ratings.shape, dtype=np.float32)
+    return (ratings / peak).astype(np.float32)
+
+
+def hybrid_scores(similarities, ratings_norm=None):
+    """Blend similarity with normalized rating the same way the UI always has"""
+    similarities = np.asarray(similarities, dtype=np.float32)
+    if ratings_norm is None:
+        return similarities
+    return similarities * SIMILARITY_WEIGHT + ratings_norm * RATING_WEIGHT
+
+
+def top_k(scores, k, exclude=None):
+    """Indices of the k best scores, best first, ties broken by lower index
+
+    Uses argpartition so the cost is O(n) plus a sort of the k winners
+    (and anything tied with the k-th score), not a sort of the whole row.
+    """
+    scores = np.asarray(scores)
+    if exclude is not None:
+        exclude = np.atleast_1d(np.asarray(exclude, dtype=np.intp))
+        scores = scores.astype(np.float64, copy=True)
+        scores[exclude] = -np.inf
+        k = min(k, scores.shape[0] - np.unique(exclude).size)
+    else:
+        k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k < scores.shape[0]:
+        part = np.argpartition(-scores, k - 1)[:k]
+        candidates = np.flatnonzero(scores >= scores[part].min())
+    else:
+        candidates = np.arange(scores.shape[0])
+    order = np.lexsort((candidates, -scores[candidates]))[:k]
+    return candidates[order]
+
+
+def recommend_rows(neighbors, query_rows, ratings_norm=None, topn=5):
+    """Top-n (indices, scores) for each query song from a NeighborIndex
+
+    The neighbour rows of the whole batch are gathered and blended with
+    ratings in one vectorized pass; each query song is excluded from its
+    own results by index.
+    """
+    query_rows = np.atleast_1d(np.asarray(query_rows, dtype=np.intp))
+    rows = [neighbors.row(q) for q in query_rows]
+    if not rows:
+        return []
+    bounds = np.cumsum([0] + [len(idx) for idx, _ in rows])
+    cols = np.concatenate([idx for idx, _ in rows]).astype(np.intp)
+    sims = np.concatenate([scores for _, scores in rows])
+    blended = hybrid_scores(sims, None if ratings_norm is None else ratings_norm[cols])
+
+    results = []
+    for query, start, end in zip(query_rows, bounds[:-1], bounds[1:]):
+        row_cols, row_scores = cols[start:end], blended[start:end]
+        best = top_k(row_scores, topn, exclude=np.flatnonzero(row_cols == query))
+        results.append((row_cols[best], row_scores[best]))
+    return results
+
+
+def recency_weights(n, half_life=5.0):
+    """Weights for n items in chronological order; the newest weighs 1"""
+    age = np.arange(n - 1, -1, -1, dtype=np.float32)
+    return np.power(0.5, age / half_life, dtype=np.float32)
+
+
+def recommend_for_seeds(neighbors, seed_rows, ratings_norm=None, topn=10, weights=None, exclude=None):
+    """Top-n (indices, scores) for a whole set of seed songs at once
+
+    The seeds' neighbour rows are concatenated and summed per candidate in
+    one vectorized pass (weighted mean similarity), blended with ratings,
+    and the seeds themselves plus ``exclude`` are left out.
+    """
+    seed_rows = np.asarray(seed_rows, dtype=np.intp)
+    if not len(seed_rows):
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+    weights = np.ones(len(seed_rows), np.float32) if weights is None else np.asarray(weights, np.float32)
+
+    rows = [neighbors.row(s) for s in seed_rows]
+    lengths = [len(idx) for idx, _ in rows]
+    cols = np.concatenate([idx for idx, _ in rows]).astype(np.intp)
+    sims = np.concatenate([scores for _, scores in rows]) * np.repeat(weights, lengths)
+    if not len(cols):
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+
+    order = np.argsort(cols, kind='stable')
+    candidates, starts = np.unique(cols[order], return_index=True)
+    similarity = np.add.reduceat(sims[order], starts) / weights.sum()
+    blended = hybrid_scores(similarity, None if ratings_norm is None else ratings_norm[candidates])
+
+    skip = seed_rows if exclude is None else np.concatenate([seed_rows, np.asarray(exclude, dtype=np.intp)])
+    best = top_k(blended, topn, exclude=np.flatnonzero(np.isin(candidates, skip)))
+    return candidates[best], blended[best]
@@ -0,0 +1,93 @@
+"""Song feature vectors and blocked top-K similarity
+
+Songs are represented by bag-of-words counts over their ``combined`` text
+(title, album, genre, singer and mood, English stop words dropped),
+L2-normalized so a dot product is the cosine similarity the original
+similarities.pkl was built from.
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+from mrs.catalog import find_duration_column, find_rating_column
+from mrs.engine import top_k
+
+COMBINED_COLUMN = 'combined'
+DEFAULT_MEMORY_MB = 256
+FEATURE_ARRAYS = ('features_data', 'features_indices', 'features_indptr')
+
+
+def combined_text(df):
+    """Join the descriptive text columns, in table order"""
+    skip = {COMBINED_COLUMN, find_rating_column(df.columns), find_duration_column(df.columns)}
+    columns = [c for c in df.columns if c not in skip and not pd.api.types.is_numeric_dtype(df[c])]
+    parts = [df[c].fillna('').astype(str) for c in columns]
+    text = parts[0]
+    for part in parts[1:]:
+        text = text + ' ' + part
+    return text
+
+
+def fit_vectorizer(texts):
+    return CountVectorizer(stop_words='english').fit(texts)
+
+
+def vectorizer_from_vocabulary(vocabulary):
+    """Rebuild a fitted vectorizer from a saved vocabulary array"""
+    return CountVectorizer(vocabulary={str(term): i for i, term in enumerate(vocabulary)})
+
+
+def vectorize(vectorizer, texts):
+    """L2-normalized float32 CSR feature matrix"""
+    return normalize(vectorizer.transform(texts).astype(np.float32), norm='l2', copy=False).tocsr()
+
+
+def vocabulary_array(vectorizer):
+    return np.asarray(vectorizer.get_feature_names_out(), dtype=str)
+
+
+def to_arrays(features):
+    return {
+        'features_data': features.data.astype(np.float32),
+        'features_indices': features.indices.astype(np.int32),
+        'features_indptr': features.indptr.astype(np.int64),
+    }
+
+
+def from_arrays(arrays, n_features):
+    """CSR matrix over the (possibly memory-mapped) saved arrays, without copying"""
+    indptr = arrays['features_indptr']
+    return sparse.csr_matrix(
+        (arrays['features_data'], arrays['features_indices'], indptr),
+        shape=(len(indptr) - 1, n_features), copy=False)
+
+
+def block_rows(n_rows, n_cols, memory_mb=DEFAULT_MEMORY_MB):
+    """How many dense float32 rows of width ``n_cols`` fit in the memory budget"""
+    return max(1, int(memory_mb * 1024 * 1024 // (4 * max(n_cols, 1))))
+
+
+def similarity_blocks(queries, candidates, memory_mb=DEFAULT_MEMORY_MB):
+    """Yield (start, dense block of queries[start:stop] @ candidates.T)"""
+    step = block_rows(queries.shape[0], candidates.shape[0], memory_mb)
+    candidates_t = candidates.T.tocsc()
+    for start in range(0, queries.shape[0], step):
+        block = queries[start:start + step] @ candidates_t
+        yield start, np.asarray(block.todense(), dtype=np.float32)
+
+
+def top_k_rows(queries, candidates, k, self_offset=None, memory_mb=DEFAULT_MEMORY_MB):
+    """Top-k (indices, scores) of every query row against all candidates
+
+    Only one block of rows is ever dense at a time, so memory stays at
+    ``memory_mb`` regardless of catalog size. If ``self_offset`` is given,
+    query row i is the same song as candidate ``self_offset + i`` and is
+    excluded from its own neighbours.
+    """
+    for start, block in similarity_blocks(queries, candidates, memory_mb):
+        for offset, row in enumerate(block):
+            exclude = None if self_offset is None else self_offset + start + offset
+            idx = top_k(row, k, exclude=exclude)
+            yield idx, row[idx]
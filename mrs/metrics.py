@@ -0,0 +1,163 @@
+"""Lightweight in-process timers and counters for the app's hot paths
+
+    from mrs import metrics
+
+    with metrics.timer('search'):
+        ...
+    metrics.incr('poster.cache_hit')
+
+    @metrics.timed('recommend')
+    def recommend(...): ...
+
+Timers keep their last ``WINDOW`` samples so p50/p95 reflect recent
+traffic. Every timing made while a rerun is open (``start_rerun`` /
+``finish_rerun``) is also collected per rerun, so slow reruns can be
+broken down span by span. Results are available as a dict
+(``summary``), Prometheus text exposition (``prometheus``) and one JSON
+log line per rerun.
+
+Set ``MRS_METRICS_FILE`` to have the Prometheus text rewritten after each
+rerun (for node_exporter's textfile collector), and ``MRS_METRICS_LOG=1``
+to log each rerun as JSON on the ``mrs.metrics`` logger.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WINDOW = 1024
+FILE_ENV = 'MRS_METRICS_FILE'
+LOG_ENV = 'MRS_METRICS_LOG'
+
+
+class Metrics:
+    """Thread-safe registry of timers (seconds) and counters"""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._counts = defaultdict(int)
+        self._totals = defaultdict(float)
+        self._counters = defaultdict(int)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self._samples[name].append(seconds)
+            self._counts[name] += 1
+            self._totals[name] += seconds
+        spans = getattr(self._local, 'spans', None)
+        if spans is not None:
+            spans[name] = spans.get(name, 0.0) + seconds
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def timed(self, name):
+        """Decorator form of ``timer``"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    # -- per rerun --
+
+    def start_rerun(self):
+        self._local.spans = {}
+        self._local.started = time.perf_counter()
+
+    def finish_rerun(self):
+        """Close this thread's rerun; returns its {span: seconds}, including 'rerun'"""
+        spans = getattr(self._local, 'spans', None)
+        if spans is None:
+            return {}
+        self._local.spans = None
+        spans['rerun'] = time.perf_counter() - self._local.started
+        self.observe('rerun', spans['rerun'])
+        if os.environ.get(LOG_ENV):
+            logger.info(json.dumps({'event': 'rerun', 'ts': time.time(),
+                                    'spans_ms': {k: round(v * 1000, 3) for k, v in spans.items()}}))
+        path = os.environ.get(FILE_ENV)
+        if path:
+            self.write_textfile(path)
+        return spans
+
+    # -- reporting --
+
+    def summary(self):
+        """{'timers': {name: count/total/p50/p95/max}, 'counters': {name: n}}"""
+        with self._lock:
+            samples = {name: np.array(values) for name, values in self._samples.items() if values}
+            counts, totals = dict(self._counts), dict(self._totals)
+            counters = dict(self._counters)
+        timers = {}
+        for name, values in sorted(samples.items()):
+            p50, p95 = np.percentile(values, [50, 95])
+            timers[name] = {'count': counts[name], 'total': totals[name], 'p50': float(p50),
+                            'p95': float(p95), 'max': float(values.max())}
+        return {'timers': timers, 'counters': dict(sorted(counters.items()))}
+
+    def prometheus(self, prefix='mrs'):
+        """Prometheus text exposition of every timer and counter"""
+        data = self.summary()
+        lines = [f"# TYPE {prefix}_duration_seconds summary"]
+        for name, t in data['timers'].items():
+            label = f'name="{name}"'
+            lines.append(f'{prefix}_duration_seconds{{{label},quantile="0.5"}} {t["p50"]:.6f}')
+            lines.append(f'{prefix}_duration_seconds{{{label},quantile="0.95"}} {t["p95"]:.6f}')
+            lines.append(f'{prefix}_duration_seconds_sum{{{label}}} {t["total"]:.6f}')
+            lines.append(f'{prefix}_duration_seconds_count{{{label}}} {t["count"]}')
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name, n in data['counters'].items():
+            lines.append(f'{prefix}_events_total{{name="{name}"}} {n}')
+        return '\n'.join(lines) + '\n'
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2)
+
+    def write_textfile(self, path):
+        tmp = f"{path}.tmp-{uuid.uuid4().hex[:6]}"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._totals.clear()
+            self._counters.clear()
+
+
+# Process-wide registry shared by every session, like the logging module's root logger
+REGISTRY = Metrics()
+observe = REGISTRY.observe
+incr = REGISTRY.incr
+timer = REGISTRY.timer
+timed = REGISTRY.timed
+start_rerun = REGISTRY.start_rerun
+finish_rerun = REGISTRY.finish_rerun
+summary = REGISTRY.summary
+prometheus = REGISTRY.prometheus
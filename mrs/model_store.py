@@ -0,0 +1,269 @@
+"""Versioned, memory-mapped model releases
+
+A release is a directory of plain ``.npy`` files plus a ``manifest.json``::
+
+    models/
+        CURRENT                      name of the live release
+        releases/<version>/
+            manifest.json
+            col_00.npy ...           one file per catalog column
+            neighbors_*.npy          see mrs.neighbors
+
+Every array is opened with ``np.load(mmap_mode='r')`` so all Streamlit
+workers on a host share one copy through the OS page cache, and opening
+a release costs a few ``open()`` calls instead of a full unpickle. String
+columns are stored as fixed-width unicode arrays, which are mmap-able too,
+and the Catalog reads values straight out of them; a DataFrame is only
+built if something asks for ``ModelArtifacts.df``.
+
+Convert the legacy pickles into a release with::
+
+    python -m mrs.model_store export
+"""
+import argparse
+import json
+import os
+import pickle
+import shutil
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from mrs.neighbors import DEFAULT_K, NeighborIndex, load_dense_pickle
+from mrs.stats import catalog_stats
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+CURRENT = 'CURRENT'
+RELEASES = 'releases'
+
+
+class StaleModelError(Exception):
+    """Raised when a release was built for another format or is incomplete"""
+
+
+class ModelArtifacts:
+    """An opened release: catalog columns, neighbour index and raw arrays
+
+    ``columns`` maps each catalog column name, in order, to a (memory-mapped)
+    numpy array.
+    """
+
+    def __init__(self, path, manifest, columns, neighbors, arrays, df=None):
+        self.path = path
+        self.manifest = manifest
+        self.columns = columns
+        self.neighbors = neighbors
+        self.arrays = arrays
+        self._df = df
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    @property
+    def df(self):
+        """The catalog as a DataFrame (a copy; built on first use)"""
+        if self._df is None:
+            self._df = pd.DataFrame({name: values.astype(object) if values.dtype.kind == 'U' else values
+                                     for name, values in self.columns.items()})
+        return self._df
+
+
+def new_version():
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+def _column_array(series):
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(), 'num'
+    return series.fillna('').astype(str).to_numpy(dtype=str), 'str'
+
+
+def _atomic_write_text(path, text):
+    tmp = f"{path}.tmp-{uuid.uuid4().hex[:6]}"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_release(root, df, neighbors, arrays=None, meta=None, publish=True):
+    """Write a new release under ``root/releases`` and optionally make it current
+
+    ``arrays`` holds extra per-model arrays (e.g. durations, features) that
+    are stored next to the catalog and come back mmapped in ``.arrays``.
+    Catalog aggregates (see mrs.stats) are stored in the manifest.
+    """
+
+    if neighbors.n_songs != len(df):
+        raise ValueError(f"neighbour index has {neighbors.n_songs} rows, catalog has {len(df)}")
+    version = new_version()
+    releases = os.path.join(root, RELEASES)
+    staging = os.path.join(releases, f".staging-{version}")
+    os.makedirs(staging)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        values, kind = _column_array(df[name])
+        filename = f"col_{i:02d}.npy"
+        np.save(os.path.join(staging, filename), values)
+        columns.append({'name': name, 'kind': kind, 'file': filename})
+    neighbors.save(staging)
+    for name, values in (arrays or {}).items():
+        np.save(os.path.join(staging, f"{name}.npy"), values)
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'n_songs': len(df),
+        'k': int(np.diff(neighbors.indptr).max()) if len(df) else 0,
+        'columns': columns,
+        'arrays': sorted(arrays or {}),
+        'stats': catalog_stats(df),
+        **(meta or {}),
+    }
+    with open(os.path.join(staging, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    path = os.path.join(releases, version)
+    os.rename(staging, path)
+    if publish:
+        publish_release(root, version)
+    return path
+
+
+def publish_release(root, version):
+    """Atomically point ``root/CURRENT`` at a release"""
+    if not os.path.exists(os.path.join(root, RELEASES, version, MANIFEST)):
+        raise FileNotFoundError(f"no release {version} under {root}")
+    _atomic_write_text(os.path.join(root, CURRENT), version + '\n')
+
+
+def current_release(root):
+    """Path of the live release, or None if nothing has been published"""
+    try:
+        with open(os.path.join(root, CURRENT), encoding='utf-8') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(root, RELEASES, version) if version else None
+
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError) as e:
+        raise StaleModelError(f"{path}: unreadable manifest ({e})") from e
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise StaleModelError(
+            f"{path}: built with format {manifest.get('format_version')}, "
+            f"this app reads format {FORMAT_VERSION}; rebuild the model")
+    return manifest
+
+
+def open_release(path):
+    """Open a release with every array memory-mapped read-only"""
+    manifest = read_manifest(path)
+    n = manifest['n_songs']
+
+    def load(filename):
+        try:
+            values = np.load(os.path.join(path, filename), mmap_mode='r')
+        except (FileNotFoundError, ValueError) as e:
+            raise StaleModelError(f"{path}: cannot open {filename} ({e})") from e
+        return values
+
+    columns = {}
+    for column in manifest['columns']:
+        values = load(column['file'])
+        if len(values) != n:
+            raise StaleModelError(f"{path}: column {column['name']!r} has {len(values)} rows, expected {n}")
+        columns[column['name']] = values
+
+    try:
+        neighbors = NeighborIndex.load(path, mmap_mode='r')
+    except (FileNotFoundError, ValueError) as e:
+        raise StaleModelError(f"{path}: cannot open neighbour index ({e})") from e
+    if neighbors.n_songs != n:
+        raise StaleModelError(f"{path}: neighbour index has {neighbors.n_songs} rows, expected {n}")
+
+    arrays = {name: load(f"{name}.npy") for name in manifest.get('arrays', [])}
+    return ModelArtifacts(path, manifest, columns, neighbors, arrays)
+
+
+def open_legacy(root='models', k=DEFAULT_K):
+    """Load musicrec.pkl plus models/neighbors or the dense similarities.pkl"""
+    with open(os.path.join(root, 'musicrec.pkl'), 'rb') as f:
+        df = pickle.load(f).reset_index(drop=True)
+    neighbor_dir = os.path.join(root, 'neighbors')
+    if NeighborIndex.exists(neighbor_dir):
+        neighbors = NeighborIndex.load(neighbor_dir)
+    else:
+        # Older deployments only ship the dense matrix; convert it on load
+        neighbors = load_dense_pickle(os.path.join(root, 'similarities.pkl'), k=k)
+    manifest = {'format_version': FORMAT_VERSION, 'version': 'legacy', 'n_songs': len(df)}
+    columns = {name: df[name].to_numpy() for name in df.columns}
+    return ModelArtifacts(root, manifest, columns, neighbors, {}, df=df)
+
+
+def load_model(root='models'):
+    """Open the current release, falling back to the legacy pickles
+
+    Raises StaleModelError if the published release cannot be used.
+    """
+    path = current_release(root)
+    if path is None:
+        return open_legacy(root)
+    return open_release(path)
+
+
+def export_legacy(root='models', k=DEFAULT_K):
+    """Turn the legacy pickles into a published release"""
+    legacy = open_legacy(root, k=k)
+    return write_release(root, legacy.df, legacy.neighbors, meta={'source': 'legacy-pickle'})
+
+
+def prune_releases(root, keep=3):
+    """Delete all but the newest ``keep`` releases, never the current one"""
+    releases = os.path.join(root, RELEASES)
+    current = os.path.basename(current_release(root) or '')
+    names = sorted(n for n in os.listdir(releases) if not n.startswith('.'))
+    removed = []
+    for name in names[:-keep] if keep else names:
+        if name == current:
+            continue
+        shutil.rmtree(os.path.join(releases, name))
+        removed.append(name)
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage memory-mapped model releases")
+    parser.add_argument('--root', default='models')
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export', help="convert the legacy pickles into a release")
+    export.add_argument('--k', type=int, default=DEFAULT_K)
+    sub.add_parser('info', help="show the current release")
+    prune = sub.add_parser('prune', help="delete old releases")
+    prune.add_argument('--keep', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        print(f"Published {export_legacy(args.root, k=args.k)}")
+    elif args.command == 'info':
+        path = current_release(args.root)
+        if path is None:
+            print("No release published; the app falls back to the legacy pickles")
+        else:
+            print(json.dumps(read_manifest(path), indent=2))
+    elif args.command == 'prune':
+        for name in prune_releases(args.root, keep=args.keep):
+            print(f"Removed {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Compact top-K neighbour index replacing the dense n x n similarity matrix
+
+Each song keeps only its K most similar other songs, stored CSR-style as
+three parallel arrays: ``indptr`` (int64, n + 1), ``indices`` (int32) and
+``scores`` (float32). Within a row, neighbours are kept in ascending song
+order so ties can be broken by song index without extra bookkeeping.
+
+Build it offline from the legacy pickle with::
+
+    python -m mrs.neighbors models/similarities.pkl models/neighbors --k 50
+"""
+import argparse
+import os
+import pickle
+
+import numpy as np
+
+from mrs.engine import top_k
+
+DEFAULT_K = 50
+FILES = {
+    'indptr': 'neighbors_indptr.npy',
+    'indices': 'neighbors_indices.npy',
+    'scores': 'neighbors_scores.npy',
+}
+
+
+class NeighborIndex:
+    """Top-K neighbours per song as parallel CSR arrays"""
+
+    def __init__(self, indptr, indices, scores):
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+
+    @property
+    def n_songs(self):
+        return len(self.indptr) - 1
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.scores.nbytes
+
+    def row(self, i):
+        """(neighbour indices, scores) for song ``i``"""
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.scores[start:end]
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from an iterable of (indices, scores) pairs, one per song"""
+        lengths, all_idx, all_scores = [0], [], []
+        for idx, scores in rows:
+            order = np.argsort(idx, kind='stable')
+            all_idx.append(np.asarray(idx, dtype=np.int32)[order])
+            all_scores.append(np.asarray(scores, dtype=np.float32)[order])
+            lengths.append(len(idx))
+        indptr = np.cumsum(lengths, dtype=np.int64)
+        if all_idx:
+            return cls(indptr, np.concatenate(all_idx), np.concatenate(all_scores))
+        return cls(indptr, np.empty(0, np.int32), np.empty(0, np.float32))
+
+    @classmethod
+    def from_dense(cls, similarity, k=DEFAULT_K, chunk_size=1024):
+        """Convert a dense similarity matrix, one block of rows at a time"""
+        n = similarity.shape[0]
+
+        def rows():
+            for start in range(0, n, chunk_size):
+                block = np.asarray(similarity[start:start + chunk_size], dtype=np.float32)
+                for offset, row in enumerate(block):
+                    idx = top_k(row, k, exclude=start + offset)
+                    yield idx, row[idx]
+
+        return cls.from_rows(rows())
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, filename in FILES.items():
+            np.save(os.path.join(directory, filename), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, mmap_mode=None):
+        arrays = {name: np.load(os.path.join(directory, filename), mmap_mode=mmap_mode)
+                  for name, filename in FILES.items()}
+        return cls(**arrays)
+
+    @staticmethod
+    def exists(directory):
+        return all(os.path.exists(os.path.join(directory, f)) for f in FILES.values())
+
+
+def load_dense_pickle(path, k=DEFAULT_K):
+    """Load a legacy similarities.pkl and convert it to a NeighborIndex"""
+    with open(path, 'rb') as f:
+        similarity = pickle.load(f)
+    return NeighborIndex.from_dense(similarity, k=k)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a top-K neighbour index from similarities.pkl")
+    parser.add_argument('source', nargs='?', default='models/similarities.pkl')
+    parser.add_argument('target', nargs='?', default='models/neighbors')
+    parser.add_argument('--k', type=int, default=DEFAULT_K)
+    args = parser.parse_args(argv)
+
+    index = load_dense_pickle(args.source, k=args.k)
+    index.save(args.target)
+    print(f"Wrote {index.n_songs} songs x top-{args.k} neighbours "
+          f"({index.nbytes / 1024:.1f} KiB) to {args.target}")
+
+
+if __name__ == '__main__':
+    main()
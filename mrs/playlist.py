@@ -0,0 +1,129 @@
+"""Duration-aware playlist generation
+
+Fills a requested length from a pool of candidate rows (normally a mood
+bucket, best rated first) in two steps:
+
+1. Greedy walk: start from the top-rated song that fits and repeatedly
+   append the unused song that best combines similarity to the previous
+   track and rating. A song is only taken if it fits in the remaining
+   time plus the tolerance, and songs with no length (0 or missing) are
+   never taken.
+2. Repair: if the total is still outside the tolerance, solve a small
+   subset-sum over the unused songs for the remaining gap (dropping the
+   last greedy track if that gives a better fit).
+
+The only randomness is a seeded tie-breaking jitter, so the same
+arguments always give the same playlist and results can be cached.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+DEFAULT_TOLERANCE = 60
+DEFAULT_POOL = 400
+SIMILARITY_WEIGHT = 0.6
+RATING_WEIGHT = 0.4
+JITTER = 0.05
+
+Playlist = namedtuple('Playlist', ['rows', 'seconds', 'total', 'target'])
+
+
+def _similarities(neighbors, row, position):
+    """Similarity of ``row`` to every candidate, from its stored neighbours"""
+    sims = np.zeros(len(position), dtype=np.float64)
+    idx, scores = neighbors.row(row)
+    for r, s in zip(np.asarray(idx).tolist(), np.asarray(scores).tolist()):
+        i = position.get(r)
+        if i is not None:
+            sims[i] = s
+    return sims
+
+
+def subset_sum(durations, low, high):
+    """Indices of items whose durations sum into [low, high], closest to the middle
+
+    Classic 0/1 subset-sum over whole seconds with parent pointers;
+    returns None if no subset fits.
+    """
+    if high < 0:
+        return None
+    target = (low + high) / 2
+    reachable = np.full(high + 1, -1, dtype=np.int64)   # item that first reached each sum
+    reachable[0] = len(durations)
+    for i, d in enumerate(durations):
+        if d <= 0 or d > high:
+            continue
+        sums = np.flatnonzero(reachable[:high + 1 - d] >= 0)
+        new = sums + d
+        # ``sums`` predates this item, so no item is counted twice
+        reachable[new[reachable[new] < 0]] = i
+    hits = np.flatnonzero(reachable[max(low, 0):] >= 0) + max(low, 0)
+    if not len(hits):
+        return None
+    best = int(hits[np.argmin(np.abs(hits - target))])
+    chosen = []
+    while best > 0:
+        i = int(reachable[best])
+        chosen.append(i)
+        best -= int(durations[i])
+    return chosen
+
+
+def build_playlist(candidates, durations, target_seconds, neighbors=None, ratings_norm=None,
+                   tolerance=DEFAULT_TOLERANCE, seed=0):
+    """Playlist of candidate rows whose total length is within tolerance of the target if possible"""
+    candidates = np.asarray(candidates, dtype=np.intp)
+    if not len(candidates) or target_seconds <= 0:
+        return Playlist([], [], 0, target_seconds)
+    rng = np.random.default_rng(seed)
+    lengths = np.nan_to_num(np.asarray(durations, dtype=np.float64)[candidates]).astype(np.int64)
+    playable = lengths > 0
+    quality = (np.asarray(ratings_norm, dtype=np.float64)[candidates] if ratings_norm is not None
+               else np.linspace(1, 0, len(candidates)))
+    jitter = rng.random(len(candidates)) * JITTER
+    position = {int(r): i for i, r in enumerate(candidates)}
+
+    used = np.zeros(len(candidates), dtype=bool)
+    order, total = [], 0
+    fits = playable & (lengths <= target_seconds + tolerance)
+    if not fits.any():
+        return Playlist([], [], 0, target_seconds)
+    current = int(np.argmax(np.where(fits, quality + jitter, -np.inf)))
+    while True:
+        used[current] = True
+        order.append(current)
+        total += int(lengths[current])
+        if total >= target_seconds - tolerance:
+            break
+        fits = ~used & playable & (lengths <= target_seconds + tolerance - total)
+        if not fits.any():
+            break
+        score = RATING_WEIGHT * quality + jitter
+        if neighbors is not None:
+            score = score + SIMILARITY_WEIGHT * _similarities(neighbors, int(candidates[current]), position)
+        current = int(np.argmax(np.where(fits, score, -np.inf)))
+
+    if abs(total - target_seconds) > tolerance:
+        order, total = _repair(order, total, lengths, used, target_seconds, tolerance)
+
+    rows = [int(candidates[i]) for i in order]
+    return Playlist(rows, [int(lengths[i]) for i in order], total, target_seconds)
+
+
+def _repair(order, total, lengths, used, target, tolerance):
+    """Top up (or swap out the last track and top up) with a subset-sum fill"""
+    attempts = [(order, total)]
+    if len(order) > 1:
+        attempts.append((order[:-1], total - int(lengths[order[-1]])))
+    best = (order, total)
+    for kept, kept_total in attempts:
+        spare = np.flatnonzero(~used).tolist() + order[len(kept):]
+        gap = target - kept_total
+        chosen = subset_sum([int(lengths[i]) for i in spare], gap - tolerance, gap + tolerance)
+        if chosen is None:
+            continue
+        filled = kept + [spare[i] for i in sorted(chosen)]
+        filled_total = kept_total + sum(int(lengths[spare[i]]) for i in chosen)
+        if abs(filled_total - target) < abs(best[1] - target):
+            best = (filled, filled_total)
+    return best
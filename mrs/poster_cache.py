@@ -0,0 +1,320 @@
+"""Content-addressed poster store with an in-memory manifest
+
+Each (song, artist) pair maps to ``<dir>/<ab>/<sha1>.jpg`` where the hash
+covers the full, untruncated pair, so two songs can never share a file.
+An append-only ``manifest.jsonl`` journal records stored posters (with
+size and image dimensions), "no artwork" results and evictions. It is
+read once at start-up, so a lookup is a dict access with no syscalls;
+the journal tail written by other workers is only re-read on a miss.
+
+Files are written to a temp name and renamed into place so concurrent
+workers never serve a half-written JPEG. Lookups that found no artwork
+(or failed) are remembered for ``miss_ttl`` / ``error_ttl`` seconds so
+they are not retried on every rerun. When the store grows past
+``max_bytes`` the least recently used posters are deleted. Uses are
+journaled at most once per ``touch_interval`` per poster, so LRU order
+survives restarts without a write on every hit. Touch and miss records
+pile up even while the store is under budget, so the journal is also
+compacted once it holds more than ``COMPACT_RATIO`` times as many records
+as there are live entries.
+
+Appends and compaction take an exclusive ``flock`` on ``manifest.lock``;
+compaction re-reads the journal under it, so no worker's record is lost
+when the journal is rewritten.
+"""
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: single worker, the thread lock is enough
+    fcntl = None
+
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_MISS_TTL = 24 * 60 * 60
+# Timeouts and connection errors are retried sooner than "no artwork found"
+DEFAULT_ERROR_TTL = 5 * 60
+MANIFEST_FILE = 'manifest.jsonl'
+LOCK_FILE = 'manifest.lock'
+DEFAULT_TOUCH_INTERVAL = 15 * 60
+EVICT_TO = 0.9
+# Compact when journal records outnumber live entries and misses this many times
+COMPACT_RATIO = 2
+# Journals this short are cheap to replay and never worth rewriting
+COMPACT_MIN_RECORDS = 1000
+
+
+def poster_key(song, artist):
+    return hashlib.sha1(f"{song}\x1f{artist}".encode('utf-8')).hexdigest()
+
+
+def image_size(data):
+    """(width, height) of JPEG or PNG bytes, or (None, None)"""
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    if data[:2] != b'\xff\xd8':
+        return None, None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            i += 1 if marker == 0xFF else 2
+            continue
+        length = struct.unpack('>H', data[i + 2:i + 4])[0]
+        # SOF0..SOF15 except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None, None
+
+
+class PosterCache:
+    """Poster files keyed by (song, artist) with a journaled manifest"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, miss_ttl=DEFAULT_MISS_TTL,
+                 error_ttl=DEFAULT_ERROR_TTL, touch_interval=DEFAULT_TOUCH_INTERVAL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.miss_ttl = miss_ttl
+        self.error_ttl = error_ttl
+        self.touch_interval = touch_interval
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self.lock_path = os.path.join(directory, LOCK_FILE)
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.entries = {}
+        self._misses = {}
+        self._last_used = {}
+        # Last use written to the journal, per key
+        self._touched = {}
+        self._offset = 0
+        self._inode = None
+        # Journal records read since it was last rewritten
+        self._records = 0
+        self._size = 0
+        self.counters = {
+            'hits': 0, 'misses': 0, 'negative_hits': 0, 'stores': 0,
+            'evictions': 0, 'fetches': 0, 'fetch_seconds': 0.0, 'fetch_max_seconds': 0.0,
+        }
+        with self._lock:
+            self._read_journal()
+
+    def get(self, song, artist):
+        """Manifest entry for a cached poster, or None; no file access on most hits"""
+        key = poster_key(song, artist)
+        entry = self.entries.get(key)
+        with self._lock:
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self.counters['hits'] += 1
+            now = time.time()
+            self._last_used[key] = now
+            if now - self._touched.get(key, 0) >= self.touch_interval:
+                self._append({'op': 'touch', 'key': key, 'time': now})
+        return entry
+
+    def peek(self, song, artist):
+        """Like get() but without counting a lookup or touching LRU order"""
+        return self.entries.get(poster_key(song, artist))
+
+    def path(self, song, artist):
+        entry = self.get(song, artist)
+        return entry['path'] if entry else None
+
+    def refresh(self):
+        """Pick up entries other workers appended since the last read"""
+        with self._lock:
+            self._read_journal()
+
+    def is_known_miss(self, song, artist):
+        key = poster_key(song, artist)
+        with self._lock:
+            expires = self._misses.get(key)
+            if expires is None:
+                return False
+            if expires < time.time():
+                del self._misses[key]
+                return False
+            self.counters['negative_hits'] += 1
+            return True
+
+    def put(self, song, artist, data):
+        """Atomically store poster bytes; returns the new manifest entry"""
+        key = poster_key(song, artist)
+        path = os.path.join(self.directory, key[:2], f"{key}.jpg")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-', suffix='.jpg')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        width, height = image_size(data)
+        entry = {'key': key, 'song': str(song), 'artist': str(artist), 'path': path,
+                 'bytes': len(data), 'width': width, 'height': height, 'time': time.time()}
+        with self._lock:
+            self._append({'op': 'put', **entry})
+            self.counters['stores'] += 1
+        self._evict_if_needed()
+        return entry
+
+    def record_miss(self, song, artist, error=False):
+        expires = time.time() + (self.error_ttl if error else self.miss_ttl)
+        with self._lock:
+            self._append({'op': 'miss', 'key': poster_key(song, artist), 'expires': expires})
+
+    def invalidate(self, song, artist):
+        """Forget a poster whose file turned out to be gone"""
+        with self._lock:
+            self._append({'op': 'evict', 'key': poster_key(song, artist)})
+
+    def record_fetch(self, seconds):
+        with self._lock:
+            self.counters['fetches'] += 1
+            self.counters['fetch_seconds'] += seconds
+            self.counters['fetch_max_seconds'] = max(self.counters['fetch_max_seconds'], seconds)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['entries'] = len(self.entries)
+            stats['bytes'] = self._size
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['fetch_avg_seconds'] = stats['fetch_seconds'] / stats['fetches'] if stats['fetches'] else 0.0
+        return stats
+
+    def _apply(self, record):
+        key, op = record['key'], record['op']
+        if op == 'put':
+            old = self.entries.get(key)
+            if old:
+                self._size -= old['bytes']
+            entry = {k: v for k, v in record.items() if k not in ('op', 'used')}
+            self.entries[key] = entry
+            self._size += entry['bytes']
+            self._use(key, record.get('used', entry['time']))
+            self._misses.pop(key, None)
+        elif op == 'touch':
+            if key in self.entries:
+                self._use(key, record['time'])
+        elif op == 'miss':
+            self._misses[key] = record['expires']
+        elif op == 'evict':
+            old = self.entries.pop(key, None)
+            if old:
+                self._size -= old['bytes']
+            self._last_used.pop(key, None)
+            self._touched.pop(key, None)
+
+    def _use(self, key, when):
+        """Record a journaled use (never moves an in-memory use backwards)"""
+        self._last_used[key] = max(self._last_used.get(key, 0), when)
+        self._touched[key] = max(self._touched.get(key, 0), when)
+
+    @contextmanager
+    def _journal_lock(self):
+        """Exclusive lock on the journal across workers (caller holds self._lock)"""
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _append(self, record):
+        """Apply a record and append it to the journal (caller holds self._lock)"""
+        with self._journal_lock():
+            self._write(record)
+            # Catch up on the tail (ours and other workers') so the record count is current
+            self._read_journal()
+            live = len(self.entries) + len(self._misses)
+            if self._records > max(COMPACT_MIN_RECORDS, COMPACT_RATIO * live):
+                self._compact()
+
+    def _write(self, record):
+        """``_append`` for callers that already hold the journal lock"""
+        self._apply(record)
+        line = (json.dumps(record) + '\n').encode('utf-8')
+        # O_APPEND keeps small concurrent writes from different workers whole
+        fd = os.open(self.manifest_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def _read_journal(self):
+        try:
+            with open(self.manifest_path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != self._inode:
+                    # First read, or the journal was compacted: start over
+                    self.entries, self._misses, self._size, self._offset = {}, {}, 0, 0
+                    self._inode = inode
+                    self._records = 0
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    self._offset += len(line)
+                    self._records += 1
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError):
+                        continue
+        except FileNotFoundError:
+            pass
+
+    def _evict_if_needed(self):
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+            with self._journal_lock():
+                # Decide on, and rewrite, the journal as it is now, including other workers' records
+                self._read_journal()
+                target = self.max_bytes * EVICT_TO
+                for key in sorted(self.entries, key=lambda k: self._last_used.get(k, 0)):
+                    if self._size <= target:
+                        break
+                    path = self.entries[key]['path']
+                    self._write({'op': 'evict', 'key': key})
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    self.counters['evictions'] += 1
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the journal with only live entries (caller holds both locks)"""
+        now = time.time()
+        records = [{'op': 'put', **entry, 'used': self._last_used.get(key, entry['time'])}
+                   for key, entry in self.entries.items()]
+        records += [{'op': 'miss', 'key': key, 'expires': expires}
+                    for key, expires in self._misses.items() if expires > now]
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix='.jsonl')
+        with os.fdopen(fd, 'wb') as f:
+            for record in records:
+                f.write((json.dumps(record) + '\n').encode('utf-8'))
+            self._offset = f.tell()
+            self._inode = os.fstat(f.fileno()).st_ino
+        os.replace(tmp, self.manifest_path)
+        self._records = len(records)
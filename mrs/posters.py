@@ -0,0 +1,143 @@
+"""Concurrent poster fetching from the iTunes search API
+
+A PosterService is shared by every session on a worker. Fetches run on a
+bounded thread pool over one pooled keep-alive ``requests.Session``, and
+concurrent requests for the same song share a single in-flight future.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import quote_plus
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from mrs import metrics
+from mrs.poster_cache import PosterCache, image_size
+
+ITUNES_SEARCH_URL = "https://itunes.apple.com/search"
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT = 5
+
+
+class RateLimiter:
+    """Thread-safe token bucket: at most ``rate`` acquisitions per second"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class PosterService:
+    """Bounded worker pool that fetches and caches poster JPEGs"""
+
+    def __init__(self, directory='posters', max_workers=DEFAULT_WORKERS,
+                 timeout=DEFAULT_TIMEOUT, search_url=ITUNES_SEARCH_URL, cache=None,
+                 rate_limiter=None):
+        self.cache = cache or PosterCache(directory)
+        self.timeout = timeout
+        self.search_url = search_url
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='poster')
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def cached(self, song, artist):
+        """Path of an already downloaded poster, or None"""
+        return self.cache.path(song, artist)
+
+    def fetch(self, song, artist):
+        """Blocking fetch: cached path, downloaded path, or None"""
+        path = self.cached(song, artist)
+        if path:
+            return path
+        return self.submit(song, artist).result()
+
+    def submit(self, song, artist):
+        """Future for a poster, sharing any fetch already in flight"""
+        key = (str(song), str(artist))
+        if self.cache.is_known_miss(*key):
+            metrics.incr('poster.known_miss')
+            return _resolved(None)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            future = self.executor.submit(self._download, *key)
+            self._inflight[key] = future
+        # Outside the lock: the callback runs inline if the fetch already finished
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _download(self, song, artist):
+        # Another worker may have fetched it since our manifest was loaded
+        self.cache.refresh()
+        entry = self.cache.peek(song, artist)
+        if entry:
+            return entry['path']
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        metrics.incr('poster.network')
+        started = time.perf_counter()
+        try:
+            query = quote_plus(f"{song} {artist} punjabi song")
+            r = self.session.get(f"{self.search_url}?term={query}&limit=1&media=music", timeout=self.timeout)
+            r.raise_for_status()
+            data = r.json()
+            if data.get('results'):
+                artwork = data['results'][0].get('artworkUrl100')
+                if artwork:
+                    artwork = artwork.replace('100x100bb', '400x400bb')
+                    image = self.session.get(artwork, timeout=self.timeout)
+                    image.raise_for_status()
+                    # Error pages and CDN placeholders must never be stored as a poster
+                    if image_size(image.content) == (None, None):
+                        raise ValueError(f"artwork for {song!r} is not a JPEG or PNG")
+                    return self.cache.put(song, artist, image.content)['path']
+        except Exception:
+            self.cache.record_miss(song, artist, error=True)
+            return None
+        finally:
+            elapsed = time.perf_counter() - started
+            self.cache.record_fetch(elapsed)
+            metrics.observe('poster.download', elapsed)
+        self.cache.record_miss(song, artist)
+        return None
+
+    def stats(self):
+        return self.cache.stats()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+def _resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
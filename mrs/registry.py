@@ -0,0 +1,137 @@
+"""Hot-reloadable model registry
+
+Watches ``models/CURRENT`` and, when a new release is published, opens it
+on a background thread, builds its indexes there and swaps it in with a
+single reference assignment. The first release is opened without
+building anything (opening is a few mmaps), so a worker starts at once;
+its indexes are built on a background thread or by the first render
+that needs one, whichever comes first. Each rerun takes one snapshot with ``current()`` and uses it
+throughout, so a render that started on the old model finishes on it.
+Once no snapshot references the old catalog its memory maps are
+released by normal garbage collection.
+"""
+import logging
+import os
+import threading
+import weakref
+
+from mrs import model_store
+from mrs.catalog import Catalog
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_SECONDS = 5.0
+# Lazy Catalog attributes built off the render path
+WARM_ATTRIBUTES = ('search_index', 'mood_index', 'durations', 'stats')
+
+
+def _pointer_state(root):
+    """(mtime_ns, contents) of the CURRENT pointer, or None if unpublished"""
+    path = os.path.join(root, model_store.CURRENT)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return os.fstat(f.fileno()).st_mtime_ns, f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def warm_catalog(catalog):
+    """Build a catalog's lazy indexes now rather than in the first render"""
+    for name in WARM_ATTRIBUTES:
+        try:
+            getattr(catalog, name)
+        except Exception:
+            logger.exception("Building %s for model %s failed", name, catalog.version)
+
+
+class ModelRegistry:
+    """Holds the live Catalog and swaps in new releases as they are published"""
+
+    def __init__(self, root='models', poll_seconds=DEFAULT_POLL_SECONDS, watch=True, warm=True):
+        self.root = root
+        self.poll_seconds = poll_seconds
+        self.last_error = None
+        self._listeners = []
+        self._live = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._loading = False
+        self._stop = threading.Event()
+
+        self._pointer = _pointer_state(root)
+        self._current = self._open(model_store.load_model(root))
+        if warm:
+            threading.Thread(target=warm_catalog, args=(self._current,), name='model-warm', daemon=True).start()
+
+        self._watcher = None
+        if watch:
+            self._watcher = threading.Thread(target=self._watch, name='model-registry', daemon=True)
+            self._watcher.start()
+
+    def current(self):
+        """The live catalog; hold on to it for the whole render"""
+        return self._current
+
+    @property
+    def version(self):
+        return self._current.version
+
+    def live_versions(self):
+        """Versions still referenced somewhere (the current one plus any in-flight)"""
+        return sorted(self._live.keys())
+
+    def on_swap(self, callback):
+        """Call ``callback(old, new)`` after each swap"""
+        self._listeners.append(callback)
+
+    def check(self):
+        """Start loading a newly published release, if there is one"""
+        pointer = _pointer_state(self.root)
+        with self._lock:
+            if pointer is None or pointer == self._pointer or self._loading:
+                return False
+            self._loading = True
+        threading.Thread(target=self._reload, args=(pointer,), name='model-reload', daemon=True).start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _open(self, model):
+        catalog = Catalog.from_artifacts(model)
+        self._live[catalog.version] = catalog
+        return catalog
+
+    def _reload(self, pointer):
+        old = catalog = None
+        try:
+            catalog = self._open(model_store.open_release(
+                os.path.join(self.root, model_store.RELEASES, pointer[1])))
+            # Renders keep using the old model until the new one's indexes are ready
+            warm_catalog(catalog)
+            old, self._current = self._current, catalog
+            self.last_error = None
+        except Exception as e:
+            # A broken release (bad manifest, missing arrays, ...) is skipped, never fatal
+            catalog = None
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.exception("Not switching to model %s", pointer[1])
+        finally:
+            with self._lock:
+                # Don't retry the same broken release until CURRENT changes again
+                self._pointer = pointer
+                self._loading = False
+        if catalog is None:
+            return
+        logger.info("Switched model %s -> %s", old.version, catalog.version)
+        for callback in self._listeners:
+            try:
+                callback(old, catalog)
+            except Exception:
+                logger.exception("Model swap listener failed")
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Model registry check failed")
@@ -0,0 +1,108 @@
+"""Bounded LRU + TTL cache for query results, shared by every session
+
+Keys are ``(model version, function name, arguments)``, so two model
+versions never share an entry. Call ``watch(registry)`` to drop a
+version's entries once the registry has swapped it out. Cached values are
+shared between callers and must be treated as read-only.
+
+Hits, misses, evictions and expirations are counted here and in
+mrs.metrics, as ``cache.<name>.hit`` and ``cache.<name>.miss``.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from mrs import metrics
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_TTL_SECONDS = 600.0
+MISSING = object()
+
+
+def freeze(value):
+    """Hashable form of call arguments (lists/sets/dicts -> tuples)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(freeze(v) for v in value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    return value
+
+
+class ResultCache:
+    """Thread-safe LRU with a per-entry time to live"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, name='result'):
+        """Cached value or MISSING"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        metrics.incr(f'cache.{name}.{"miss" if entry is None else "hit"}')
+        return MISSING if entry is None else entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def memoize(self, name):
+        """Cache ``func(catalog, *args, **kwargs)`` per model version"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(catalog, *args, **kwargs):
+                key = (catalog.version, name, freeze(args), freeze(kwargs))
+                value = self.get(key, name)
+                if value is MISSING:
+                    value = func(catalog, *args, **kwargs)
+                    self.put(key, value)
+                return value
+            return wrapper
+        return decorate
+
+    def invalidate(self, version=None):
+        """Drop one model version's entries, or everything; returns how many"""
+        with self._lock:
+            if version is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                return dropped
+            stale = [key for key in self._entries if key[0] == version]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def watch(self, registry):
+        """Invalidate the old version's entries whenever ``registry`` swaps models"""
+        registry.on_swap(lambda old, new: self.invalidate(old.version))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'max_entries': self.max_entries, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'evictions': self.evictions, 'expirations': self.expirations}
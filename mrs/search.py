@@ -0,0 +1,189 @@
+"""Inverted-index search over titles, artists and moods
+
+Built once per catalog. Each query token is matched against the index
+vocabulary exactly, by prefix, and (when neither hits) fuzzily on a
+phonetic key that folds common Punjabi transliteration variants
+(Muqabla/Muqabala, Dhillon/Dilon, Moosewala/Musewala). Scores are summed
+over tokens with per-field weights, so nothing here scans the DataFrame.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+from collections import OrderedDict, defaultdict, namedtuple
+
+import numpy as np
+
+FIELD_WEIGHTS = {'title': 3.0, 'artist': 2.0, 'mood': 1.0}
+EXACT, PHONETIC, PREFIX, FUZZY = 1.0, 0.9, 0.7, 0.5
+MIN_PREFIX = 1
+MIN_FUZZY = 3
+QUERY_CACHE_SIZE = 256
+
+SearchPage = namedtuple('SearchPage', ['rows', 'total', 'page', 'page_size'])
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+_PHONETIC_RULES = [
+    ('ph', 'f'), ('q', 'k'), ('ck', 'k'), ('w', 'v'), ('z', 'j'),
+    ('ee', 'i'), ('oo', 'u'), ('ou', 'u'), ('y', 'i'),
+]
+
+
+def tokenize(text):
+    """Case-folded word tokens; accents are dropped but every script is kept"""
+    text = str(text)
+    if text.isascii():
+        return [t for t in _NON_WORD.split(text.lower()) if t]
+    # Strip combining marks (Mūsewala -> musewala); Gurmukhi, Devanagari etc. stay searchable
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(c if unicodedata.category(c)[0] in 'LNM' else ' '
+                   for c in text if unicodedata.category(c) != 'Mn')
+    return text.split()
+
+
+def phonetic_key(token):
+    """Fold spelling variants common in romanized Punjabi onto one key"""
+    key = token
+    for old, new in _PHONETIC_RULES:
+        key = key.replace(old, new)
+    # Aspirates (dh, bh, kh...) are often written without the h
+    key = key[:1] + key[1:].replace('h', '')
+    # Doubled letters (Jatt/Jat, Dhillon/Dhilon) and vowel-length marks
+    key = re.sub(r'(.)\1+', r'\1', key)
+    return key.replace('a', '') if len(key) > 3 else key
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, giving up early once it exceeds ``limit``"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _trigrams(key):
+    padded = f"^{key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Tokenized inverted index with prefix and fuzzy matching"""
+
+    def __init__(self, fields):
+        """``fields`` maps a field name in FIELD_WEIGHTS to one text per row"""
+        postings = defaultdict(lambda: defaultdict(float))
+        for field, texts in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for row, text in enumerate(texts):
+                for token in set(tokenize(text)):
+                    postings[token][row] += weight
+
+        self.vocab = sorted(postings)
+        self.postings = {}
+        for token, rows in postings.items():
+            ids = np.fromiter(rows.keys(), dtype=np.int32, count=len(rows))
+            weights = np.fromiter(rows.values(), dtype=np.float32, count=len(rows))
+            order = np.argsort(ids)
+            self.postings[token] = (ids[order], weights[order])
+
+        self.by_phonetic = defaultdict(list)
+        self.by_trigram = defaultdict(set)
+        for token in self.vocab:
+            key = phonetic_key(token)
+            self.by_phonetic[key].append(token)
+            for gram in _trigrams(key):
+                self.by_trigram[gram].add(key)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        fields = {'title': catalog.titles}
+        for field in ('artist', 'mood'):
+            if catalog.column(field):
+                fields[field] = catalog.values(field, np.arange(len(catalog)), default='')
+        return cls(fields)
+
+    def _expand(self, token):
+        """(term, match quality) pairs for one query token"""
+        matches = {}
+        if token in self.postings:
+            matches[token] = EXACT
+        key = phonetic_key(token)
+        for term in self.by_phonetic.get(key, ()):
+            matches.setdefault(term, PHONETIC)
+        if len(token) >= MIN_PREFIX:
+            start = bisect.bisect_left(self.vocab, token)
+            for term in self.vocab[start:]:
+                if not term.startswith(token):
+                    break
+                matches.setdefault(term, PREFIX)
+        if not matches and len(token) >= MIN_FUZZY:
+            limit = 1 if len(key) <= 5 else 2
+            candidates = set()
+            for gram in _trigrams(key):
+                candidates |= self.by_trigram.get(gram, set())
+            for candidate in candidates:
+                distance = edit_distance(key, candidate, limit)
+                if distance <= limit:
+                    quality = FUZZY * (1 - distance / (len(key) + 1))
+                    for term in self.by_phonetic[candidate]:
+                        matches[term] = max(matches.get(term, 0.0), quality)
+        return matches
+
+    def _token_scores(self, token):
+        """Best score per row for one query token, as (rows, scores)"""
+        parts = [(self.postings[term][0], self.postings[term][1] * quality)
+                 for term, quality in self._expand(token).items()]
+        if not parts:
+            return np.empty(0, np.int32), np.empty(0, np.float32)
+        rows = np.concatenate([p[0] for p in parts])
+        scores = np.concatenate([p[1] for p in parts])
+        order = np.argsort(rows, kind='stable')
+        rows, scores = rows[order], scores[order]
+        unique, starts = np.unique(rows, return_index=True)
+        return unique, np.maximum.reduceat(scores, starts)
+
+    def _rank(self, tokens):
+        per_token = [self._token_scores(t) for t in tokens]
+        per_token = [p for p in per_token if len(p[0])]
+        if not per_token:
+            return np.empty(0, np.int32)
+        rows = np.concatenate([p[0] for p in per_token])
+        scores = np.concatenate([p[1] for p in per_token])
+        order = np.argsort(rows, kind='stable')
+        rows, scores = rows[order], scores[order]
+        unique, starts, counts = np.unique(rows, return_index=True, return_counts=True)
+        totals = np.add.reduceat(scores, starts)
+        # Rows matching more of the query win, then higher score, then row order
+        ranking = np.lexsort((unique, -totals, -counts))
+        return unique[ranking]
+
+    def ranked(self, query):
+        """All matching row ids, best first"""
+        tokens = tuple(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            if tokens in self._cache:
+                self._cache.move_to_end(tokens)
+                return self._cache[tokens]
+        rows = self._rank(tokens)
+        with self._lock:
+            self._cache[tokens] = rows
+            if len(self._cache) > QUERY_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return rows
+
+    def search(self, query, page=0, page_size=20):
+        """One page of ranked row ids plus the total number of matches"""
+        rows = self.ranked(query)
+        if page_size is None:
+            return SearchPage(rows, len(rows), 0, len(rows))
+        start = page * page_size
+        return SearchPage(rows[start:start + page_size], len(rows), page, page_size)
@@ -0,0 +1,139 @@
+"""Headless recommendation service
+
+The queries behind every view, as plain functions of a Catalog that return
+JSON-ready dicts. The Streamlit app, the HTTP API (mrs.api) and batch jobs
+all call these, so none of them has to scrape another's output.
+
+Per-song recommendations and mood/playlist queries are memoized in
+``CACHE`` per model version. Results are shared between callers, so copy
+before modifying them.
+"""
+import math
+
+import numpy as np
+
+from mrs import engine
+from mrs.playlist import DEFAULT_POOL, build_playlist
+from mrs.result_cache import MISSING, ResultCache
+
+DEFAULT_TOPN = 5
+RECENT_PLAYS = 10
+
+# One per process: shared by every session of the app and every API request
+CACHE = ResultCache()
+
+
+def _plain(value):
+    """JSON-safe scalar: numpy -> Python, NaN -> None"""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def songs(catalog, rows, scores=None):
+    """Song dicts for catalog rows, with a ``score`` each if scores are given"""
+    rows = np.asarray(rows, dtype=np.intp)
+    columns = {
+        'title': catalog.titles[rows].tolist(),
+        'artist': catalog.values('album', rows),
+        'singer': catalog.values('artist', rows),
+        'genre': catalog.values('genre', rows),
+        'mood': catalog.values('mood', rows),
+        'rating': catalog.values('rating', rows, default=None),
+    }
+    result = []
+    for i, row in enumerate(rows.tolist()):
+        song = {'row': row, **{key: _plain(values[i]) for key, values in columns.items()}}
+        if scores is not None:
+            song['score'] = float(scores[i])
+        result.append(song)
+    return result
+
+
+def recommend(catalog, title, topn=DEFAULT_TOPN):
+    """Songs most like ``title`` (empty if it is not in the catalog)"""
+    return recommend_many(catalog, [title], topn)[0]
+
+
+def recommend_many(catalog, titles, topn=DEFAULT_TOPN):
+    """``recommend`` for many titles; cache misses share one vectorized engine call"""
+    keys = [(catalog.version, 'recommend', (title, topn), ()) for title in titles]
+    results = [CACHE.get(key, 'recommend') for key in keys]
+    missing = [i for i, result in enumerate(results) if result is MISSING]
+    if missing:
+        computed = _recommend_many(catalog, [titles[i] for i in missing], topn)
+        for i, result in zip(missing, computed):
+            CACHE.put(keys[i], result)
+            results[i] = result
+    return results
+
+
+def _recommend_many(catalog, titles, topn):
+    rows = [catalog.row_of(t) for t in titles]
+    known = [r for r in rows if r is not None]
+    ranked = iter(engine.recommend_rows(catalog.neighbors, known, catalog.ratings_norm, topn) if known else [])
+    return [songs(catalog, *next(ranked)) if r is not None else [] for r in rows]
+
+
+def recommend_for_you(catalog, favorites=(), plays=(), topn=DEFAULT_TOPN, recent_plays=RECENT_PLAYS):
+    """One feed from every favorite plus the most recent plays, newest weighted most
+
+    ``plays`` is oldest first; songs already played are never recommended.
+    """
+    plays = list(plays)
+    favorite_rows = catalog.rows_of(favorites)
+    played_rows = catalog.rows_of(plays[-recent_plays:])
+    seeds = favorite_rows + played_rows
+    if not seeds:
+        return []
+    weights = list(engine.recency_weights(len(favorite_rows), half_life=float('inf'))) + \
+        list(engine.recency_weights(len(played_rows)))
+    rows, scores = engine.recommend_for_seeds(catalog.neighbors, seeds, catalog.ratings_norm, topn,
+                                              weights=weights, exclude=catalog.rows_of(plays))
+    return songs(catalog, rows, scores)
+
+
+def search(catalog, query, page=0, page_size=20):
+    """One page of ranked search results plus the total number of matches"""
+    result = catalog.search_index.search(query, page=page, page_size=page_size)
+    return {'query': query, 'total': int(result.total), 'page': result.page, 'page_size': result.page_size,
+            'results': songs(catalog, result.rows)}
+
+
+@CACHE.memoize('mood_rows')
+def mood_rows(catalog, mood, topn=10, match='any'):
+    """Best rated rows for a mood, or for a list of moods matching any or all of them
+
+    Empty if the catalog has no moods.
+    """
+    if catalog.mood_col is None:
+        return np.empty(0, dtype=np.intp)
+    if isinstance(mood, str):
+        return catalog.mood_index.top(mood, topn)
+    return catalog.mood_index.query(mood, match, topn)
+
+
+@CACHE.memoize('mood')
+def mood(catalog, mood, topn=10, match='any'):
+    return songs(catalog, mood_rows(catalog, mood, topn, match))
+
+
+@CACHE.memoize('playlist')
+def playlist(catalog, mood, minutes, seed=None):
+    """A mood playlist filled to ``minutes`` from real (or estimated) track lengths"""
+    target = int(minutes * 60)
+    pool = mood_rows(catalog, mood, DEFAULT_POOL)
+    result = {'mood': mood, 'target_seconds': target, 'total_seconds': 0, 'songs': []}
+    if not len(pool):
+        return result
+    durations, known = catalog.durations
+    built = build_playlist(pool, durations, target, catalog.neighbors, catalog.ratings_norm,
+                           seed=minutes if seed is None else seed)
+    tracks = songs(catalog, built.rows)
+    for track, seconds in zip(tracks, built.seconds):
+        track['seconds'] = seconds
+        track['estimated_length'] = not bool(known[track['row']])
+    result.update(total_seconds=built.total, songs=tracks)
+    return result
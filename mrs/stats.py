@@ -0,0 +1,126 @@
+"""Precomputed catalog aggregates and incrementally maintained user profiles
+
+``catalog_stats`` is computed once when a release is written and stored in
+its manifest, so the dashboard and Analytics tab read plain numbers instead
+of running ``value_counts``/``describe`` over the whole catalog on every
+rerun. Releases written before this existed get them computed once when
+the Catalog is opened.
+"""
+from collections import Counter, deque
+
+import numpy as np
+import pandas as pd
+
+from mrs.catalog import ARTIST_COLUMN, GENRE_COLUMN, MOOD_COLUMN, find_rating_column
+
+RECENT_PLAYS = 10
+# Rows kept in the precomputed best-rated list
+TOP_RATED = 20
+
+
+def _plain(value):
+    """numpy scalar -> Python scalar so it survives json"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _counts(series):
+    return [[str(name), int(count)] for name, count in series.value_counts().items()]
+
+
+def top_rated_rows(ratings, n=TOP_RATED):
+    """Row ids of the n best rated songs, ties by row order; unrated rows last"""
+    ratings = np.asarray(ratings, dtype=np.float64)
+    ratings = np.where(np.isnan(ratings), -np.inf, ratings)
+    return np.lexsort((np.arange(len(ratings)), -ratings))[:n].tolist()
+
+
+def catalog_stats(df):
+    """Song, artist, rating, mood and genre aggregates as a JSON-able dict"""
+    rating_col = find_rating_column(df.columns)
+    rating = None
+    top_rated = list(range(min(TOP_RATED, len(df))))
+    if rating_col and len(df):
+        ratings = df[rating_col]
+        top_rated = top_rated_rows(ratings.to_numpy())
+        # No rated songs at all: None rather than a NaN mean, which is not valid JSON
+        if ratings.notna().any():
+            rating = {
+                'count': int(ratings.count()),
+                'mean': float(ratings.mean()),
+                'min': _plain(ratings.min()),
+                'max': _plain(ratings.max()),
+            }
+    return {
+        'n_songs': len(df),
+        'n_artists': int(df[ARTIST_COLUMN].nunique()) if ARTIST_COLUMN in df.columns else None,
+        'rating': rating,
+        'moods': _counts(df[MOOD_COLUMN]) if MOOD_COLUMN in df.columns else None,
+        'genres': _counts(df[GENRE_COLUMN]) if GENRE_COLUMN in df.columns else None,
+        'top_rated': top_rated,
+    }
+
+
+class UserProfile:
+    """Mood counts over recent plays and genre counts over favorites
+
+    Updated per event instead of recomputed from the full history, so the
+    Analytics tab costs the same however long a user has been listening.
+    Keeps only the model version, row ids and counts, never the Catalog,
+    so an idle session does not pin a superseded model in memory. Pass
+    the live catalog to each update and build a new profile once
+    ``matches`` is False.
+    """
+
+    def __init__(self, catalog, favorites=(), plays=(), recent=RECENT_PLAYS):
+        self.version = catalog.version
+        self.recent_rows = deque(maxlen=recent)
+        self.recent_moods = Counter()
+        self.favorite_genres = Counter()
+        for title in favorites:
+            self.add_favorite(catalog, title)
+        for title in plays:
+            self.add_play(catalog, title)
+
+    def matches(self, catalog):
+        """Whether this profile's row ids refer to ``catalog``"""
+        return catalog.version == self.version
+
+    def _value(self, catalog, role, row):
+        if row is None or catalog.column(role) is None:
+            return None
+        if catalog.version != self.version:
+            raise ValueError(f"profile was built for model {self.version}, not {catalog.version}")
+        value = catalog.values(role, [row])[0]
+        return None if pd.isna(value) or value == '' else value
+
+    def add_favorite(self, catalog, title):
+        genre = self._value(catalog, 'genre', catalog.row_of(title))
+        if genre is not None:
+            self.favorite_genres[genre] += 1
+
+    def remove_favorite(self, catalog, title):
+        genre = self._value(catalog, 'genre', catalog.row_of(title))
+        if genre is not None:
+            self.favorite_genres[genre] -= 1
+            if self.favorite_genres[genre] <= 0:
+                del self.favorite_genres[genre]
+
+    def add_play(self, catalog, title):
+        """Count a play; the oldest one drops out of the recent window"""
+        if len(self.recent_rows) == self.recent_rows.maxlen:
+            old = self._value(catalog, 'mood', self.recent_rows[0])
+            if old is not None:
+                self.recent_moods[old] -= 1
+                if self.recent_moods[old] <= 0:
+                    del self.recent_moods[old]
+        row = catalog.row_of(title)
+        self.recent_rows.append(row)
+        mood = self._value(catalog, 'mood', row)
+        if mood is not None:
+            self.recent_moods[mood] += 1
+
+    def top_moods(self, n=None):
+        return self.recent_moods.most_common(n)
+
+    def top_genres(self, n=None):
+        return self.favorite_genres.most_common(n)
@@ -0,0 +1,86 @@
+"""Mood (or any tag column) buckets with rows pre-sorted by rating
+
+Built once per catalog. Every tag (a cell like "Happy, Energetic" gives
+two) maps to its row ids already in descending rating order, so the
+top-N songs for a mood is an array slice. Queries match tags by
+case-insensitive substring, like the ``str.contains`` filter they
+replace, but only the handful of distinct tags is scanned, never the
+DataFrame.
+"""
+import re
+
+import numpy as np
+
+_SEPARATORS = re.compile(r'\s*[,/|;]\s*')
+
+
+def split_tags(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    return [t for t in _SEPARATORS.split(str(value).strip()) if t]
+
+
+class TagIndex:
+    """Row ids per tag, best rated first (ties and missing ratings by row order)"""
+
+    def __init__(self, values, ratings=None):
+        n = len(values)
+        if ratings is None:
+            order = np.arange(n)
+        else:
+            ratings = np.asarray(ratings, dtype=np.float64)
+            ratings = np.where(np.isnan(ratings), -np.inf, ratings)
+            order = np.lexsort((np.arange(n), -ratings))
+        # Position of each row in global rating order, used to merge buckets
+        self.rank = np.empty(n, dtype=np.int64)
+        self.rank[order] = np.arange(n)
+
+        buckets = {}
+        for row in order:
+            for tag in split_tags(values[row]):
+                buckets.setdefault(tag, []).append(row)
+        self.rows_by_tag = {tag: np.asarray(rows, dtype=np.intp) for tag, rows in buckets.items()}
+        self._lower = {tag: tag.lower() for tag in self.rows_by_tag}
+
+    @property
+    def tags(self):
+        return list(self.rows_by_tag)
+
+    def counts(self):
+        """Songs per tag, most common first"""
+        return sorted(((tag, len(rows)) for tag, rows in self.rows_by_tag.items()), key=lambda x: -x[1])
+
+    def matching_tags(self, query):
+        query = str(query).lower()
+        return [tag for tag, lower in self._lower.items() if query in lower]
+
+    def _merge(self, buckets, n=None):
+        """Union of rating-sorted buckets, in rating order, first n only"""
+        if not buckets:
+            return np.empty(0, dtype=np.intp)
+        if len(buckets) == 1:
+            return buckets[0][:n]
+        # The top n of a union is within the union of each bucket's top n
+        rows = np.unique(np.concatenate([b[:n] for b in buckets]))
+        return rows[np.argsort(self.rank[rows])][:n]
+
+    def top(self, query, n=None):
+        """Best-rated rows whose tag contains ``query``"""
+        return self._merge([self.rows_by_tag[t] for t in self.matching_tags(query)], n)
+
+    def query(self, queries, mode='any', n=None):
+        """Rows matching any (union) or all (intersection) of the queries"""
+        if mode == 'any':
+            buckets = [self.rows_by_tag[t] for q in queries for t in self.matching_tags(q)]
+            return self._merge(buckets, n)
+        if mode != 'all':
+            raise ValueError(f"mode must be 'any' or 'all', not {mode!r}")
+        rows = None
+        for q in queries:
+            matched = self._merge([self.rows_by_tag[t] for t in self.matching_tags(q)])
+            rows = matched if rows is None else np.intersect1d(rows, matched)
+            if not len(rows):
+                break
+        if rows is None:
+            return np.empty(0, dtype=np.intp)
+        return rows[np.argsort(self.rank[rows])][:n]
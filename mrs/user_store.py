@@ -0,0 +1,225 @@
+"""Persistent favorites and play history in SQLite
+
+One database file is shared by every Streamlit session on a host. It runs
+in WAL mode, so readers never block the writer or each other. Each thread
+gets its own read connection, and all writes go through a queue to a single
+writer thread. The writer commits them in batches, one transaction per
+batch, so a burst of clicks costs one fsync rather than one per click.
+
+A session loads its user once with ``session(user)`` and then works on the
+in-memory UserData. Membership checks are O(1) and writes are queued.
+"""
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join('data', 'users.db')
+BATCH_SIZE = 256
+FLUSH_SECONDS = 0.2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS favorites (
+    user TEXT NOT NULL,
+    title TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    added REAL NOT NULL,
+    PRIMARY KEY (user, title)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS plays (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    title TEXT NOT NULL,
+    played REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plays_by_user ON plays (user, id);
+CREATE TABLE IF NOT EXISTS users (
+    user TEXT PRIMARY KEY,
+    now_playing TEXT
+);
+"""
+
+ADD_FAVORITE = """
+INSERT OR IGNORE INTO favorites (user, title, position, added)
+VALUES (?1, ?2, (SELECT COALESCE(MAX(position), 0) + 1 FROM favorites WHERE user = ?1), ?3)
+"""
+REMOVE_FAVORITE = "DELETE FROM favorites WHERE user = ? AND title = ?"
+RECORD_PLAY = "INSERT INTO plays (user, title, played) VALUES (?, ?, ?)"
+SET_NOW_PLAYING = """
+INSERT INTO users (user, now_playing) VALUES (?1, ?2)
+ON CONFLICT (user) DO UPDATE SET now_playing = ?2
+"""
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class UserStore:
+    """Shared SQLite store with per-thread readers and one batching writer"""
+
+    def __init__(self, path=DEFAULT_PATH, batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.last_error = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = connect(path)
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name='user-store', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return conn
+
+    # -- reads --
+
+    def favorites(self, user):
+        rows = self._reader().execute(
+            "SELECT title FROM favorites WHERE user = ? ORDER BY position", (user,))
+        return [title for title, in rows]
+
+    def plays(self, user, limit=None):
+        """(title, played) events, oldest first; the newest ``limit`` if given"""
+        sql = "SELECT title, played FROM plays WHERE user = ? ORDER BY id DESC"
+        params = (user,)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (limit,)
+        return self._reader().execute(sql, params).fetchall()[::-1]
+
+    def history(self, user):
+        """Distinct played titles in the order they were first played"""
+        rows = self._reader().execute(
+            "SELECT title FROM plays WHERE user = ? GROUP BY title ORDER BY MIN(id)", (user,))
+        return [title for title, in rows]
+
+    def now_playing(self, user):
+        row = self._reader().execute("SELECT now_playing FROM users WHERE user = ?", (user,)).fetchone()
+        return row[0] if row else None
+
+    def session(self, user):
+        return UserData(self, user)
+
+    # -- writes (queued) --
+
+    def add_favorite(self, user, title):
+        self._put(ADD_FAVORITE, (user, title, time.time()))
+
+    def remove_favorite(self, user, title):
+        self._put(REMOVE_FAVORITE, (user, title))
+
+    def record_play(self, user, title, played=None):
+        self._put(RECORD_PLAY, (user, title, played or time.time()))
+
+    def set_now_playing(self, user, title):
+        self._put(SET_NOW_PLAYING, (user, title))
+
+    def _put(self, sql, params):
+        if self._closed:
+            raise RuntimeError("UserStore is closed")
+        self._queue.put((sql, params))
+
+    def flush(self):
+        """Block until every queued write is committed"""
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        conn = connect(self.path)
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Give a burst a moment to accumulate, then take everything queued
+            deadline = time.monotonic() + self.flush_seconds
+            while item is not None and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+            writes = [w for w in batch if w is not None]
+            try:
+                if writes:
+                    conn.execute("BEGIN IMMEDIATE")
+                    for sql, params in writes:
+                        conn.execute(sql, params)
+                    conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                self.last_error = e
+                logger.exception("Writing %d user-store changes failed", len(writes))
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(writes) < len(batch):
+                conn.close()
+                return
+
+
+class UserData:
+    """One user's favorites (an ordered set) and play history, written through
+
+    ``history`` keeps each song once, in the order it was first played;
+    every play is still recorded in the store with its timestamp.
+    """
+
+    def __init__(self, store, user):
+        self.store = store
+        self.user = user
+        self.favorites = dict.fromkeys(store.favorites(user))
+        self.history = store.history(user)
+        self._played = set(self.history)
+        self.now_playing = store.now_playing(user)
+
+    def add_favorite(self, title):
+        """False if the song was already a favorite"""
+        if title in self.favorites:
+            return False
+        self.favorites[title] = None
+        self.store.add_favorite(self.user, title)
+        return True
+
+    def remove_favorite(self, title):
+        if title in self.favorites:
+            del self.favorites[title]
+            self.store.remove_favorite(self.user, title)
+
+    def record_play(self, title):
+        """Record a play; True if the song is new to this user's history"""
+        self.store.record_play(self.user, title)
+        if title in self._played:
+            return False
+        self._played.add(title)
+        self.history.append(title)
+        return True
+
+    def set_now_playing(self, title):
+        self.now_playing = title
+        self.store.set_now_playing(self.user, title)
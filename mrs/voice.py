@@ -0,0 +1,167 @@
+"""Offline voice search: transcribe a clip and resolve it to a catalog title
+
+Recognition uses Vosk (``pip install vosk``) with a model unpacked under
+``models/vosk``, or wherever ``MRS_VOSK_MODEL`` points. Both are optional.
+Without them ``VoiceSearch.available`` is False and the app hides the
+feature.
+
+Clips are decoded on a small worker pool. The returned Transcription
+exposes the partial transcript as it grows, so the UI can show progress
+instead of blocking on the whole clip.
+"""
+import difflib
+import io
+import json
+import os
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from mrs.search import tokenize
+
+DEFAULT_MODEL_PATH = 'models/vosk'
+DEFAULT_WORKERS = 2
+CHUNK_FRAMES = 4000
+MATCH_CANDIDATES = 20
+MATCH_CUTOFF = 0.5
+
+try:
+    import vosk
+except ImportError:
+    vosk = None
+
+
+def read_wav(data):
+    """(mono 16-bit PCM bytes, sample rate) from WAV file contents"""
+    with wave.open(io.BytesIO(data)) as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("voice search needs 16-bit PCM WAV audio")
+        channels, rate = wav.getnchannels(), wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2')
+    if channels > 1:
+        samples = samples[:len(samples) // channels * channels].reshape(-1, channels)
+        samples = samples.mean(axis=1).astype('<i2')
+    return samples.tobytes(), rate
+
+
+class Transcription:
+    """A clip being transcribed; ``partial`` grows until ``done``"""
+
+    def __init__(self):
+        self.partial = ''
+        self.text = None
+        self.error = None
+        self.done = False
+        self._changed = threading.Condition()
+
+    def _update(self, partial):
+        with self._changed:
+            self.partial = partial
+            self._changed.notify_all()
+
+    def _finish(self, text=None, error=None):
+        with self._changed:
+            self.text = text
+            self.error = error
+            if text is not None:
+                self.partial = text
+            self.done = True
+            self._changed.notify_all()
+
+    def updates(self, timeout=30):
+        """Yield the partial transcript each time it changes, until done or timed out"""
+        deadline = time.monotonic() + timeout
+        seen = None
+        while True:
+            with self._changed:
+                if self.partial == seen and not self.done:
+                    self._changed.wait(max(0, deadline - time.monotonic()))
+                partial, done = self.partial, self.done
+            if partial != seen:
+                seen = partial
+                yield partial
+            if done or time.monotonic() >= deadline:
+                return
+
+
+class VoiceSearch:
+    """Worker pool around a speech recognizer
+
+    ``recognizer_factory(sample_rate)`` must return an object with Vosk's
+    KaldiRecognizer interface (AcceptWaveform, PartialResult, Result,
+    FinalResult); by default it builds one from the Vosk model.
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, max_workers=DEFAULT_WORKERS,
+                 recognizer_factory=None):
+        self.model_path = model_path
+        self.custom_recognizer = recognizer_factory is not None
+        self.recognizer_factory = recognizer_factory or self._vosk_recognizer
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='voice')
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return self.custom_recognizer or (vosk is not None and os.path.isdir(self.model_path))
+
+    def _vosk_recognizer(self, sample_rate):
+        if vosk is None:
+            raise RuntimeError("voice search needs the optional 'vosk' package")
+        with self._lock:
+            if self._model is None:
+                vosk.SetLogLevel(-1)
+                self._model = vosk.Model(self.model_path)
+        return vosk.KaldiRecognizer(self._model, sample_rate)
+
+    def submit(self, audio):
+        """Start transcribing WAV bytes; returns a Transcription"""
+        job = Transcription()
+        self.executor.submit(self._transcribe, job, audio)
+        return job
+
+    def _transcribe(self, job, audio):
+        try:
+            pcm, rate = read_wav(audio)
+            recognizer = self.recognizer_factory(rate)
+            phrases = []
+            step = CHUNK_FRAMES * 2
+            for start in range(0, len(pcm), step):
+                if recognizer.AcceptWaveform(pcm[start:start + step]):
+                    phrases.append(json.loads(recognizer.Result()).get('text', ''))
+                    partial = ''
+                else:
+                    partial = json.loads(recognizer.PartialResult()).get('partial', '')
+                job._update(' '.join(p for p in phrases + [partial] if p))
+            phrases.append(json.loads(recognizer.FinalResult()).get('text', ''))
+            job._finish(text=' '.join(p for p in phrases if p))
+        except Exception as e:
+            job._finish(error=e)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _similarity(a, b):
+    return difflib.SequenceMatcher(None, ' '.join(tokenize(a)), ' '.join(tokenize(b))).ratio()
+
+
+def resolve_title(catalog, transcript, candidates=MATCH_CANDIDATES, cutoff=MATCH_CUTOFF):
+    """Catalog title that best matches a transcript, or None
+
+    The search index (phonetic, prefix and fuzzy matching per word)
+    proposes candidates, and only those are re-ranked by similarity to the
+    whole transcript, so a query never scans every title.
+    """
+    if not transcript or not transcript.strip():
+        return None
+    rows = catalog.search_index.ranked(transcript)[:candidates]
+    titles = dict.fromkeys(str(catalog.titles[r]) for r in rows)
+    scored = [(_similarity(transcript, t), t) for t in titles]
+    best = max(scored, default=None, key=lambda pair: pair[0])
+    if best is None or best[0] < cutoff:
+        return None
+    return best[1]
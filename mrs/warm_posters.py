@@ -0,0 +1,95 @@
+"""Fill the poster cache for the whole catalog ahead of time
+
+Uses the same PosterService and PosterCache as the app, so the entries it
+writes are exactly the ones the app looks up. Songs already in the
+manifest (or recently found to have no artwork) are skipped, which makes
+an interrupted run resumable: just start it again.
+
+    python -m mrs.warm_posters --workers 8 --rate 15
+"""
+import argparse
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+
+from mrs import model_store
+from mrs.catalog import Catalog
+from mrs.posters import DEFAULT_WORKERS, ITUNES_SEARCH_URL, PosterService, RateLimiter
+
+REPORT_EVERY = 5.0
+
+
+def catalog_pairs(catalog):
+    """(song, artist) pairs exactly as the app's cards request them"""
+    rows = np.arange(len(catalog))
+    artists = catalog.values('album', rows)
+    return list(dict.fromkeys(zip(map(str, catalog.titles), map(str, artists))))
+
+
+def warm(service, pairs, max_inflight, report=print, report_every=REPORT_EVERY):
+    """Fetch every uncached pair with at most ``max_inflight`` queued; returns counts"""
+    counts = {'total': len(pairs), 'skipped': 0, 'fetched': 0, 'missing': 0}
+    todo = []
+    for song, artist in pairs:
+        if service.cache.peek(song, artist) or service.cache.is_known_miss(song, artist):
+            counts['skipped'] += 1
+        else:
+            todo.append((song, artist))
+
+    started = last_report = time.monotonic()
+    pending = set()
+
+    def progress(final=False):
+        done = counts['fetched'] + counts['missing']
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0.0
+        eta = (len(todo) - done) / rate if rate else float('inf')
+        label = "Done" if final else "Progress"
+        report(f"{label}: {done}/{len(todo)} fetched this run ({counts['skipped']} already cached), "
+               f"{counts['fetched']} posters, {counts['missing']} without artwork, "
+               f"{rate:.1f} songs/s, elapsed {elapsed:.0f}s" + ("" if final else f", ETA {eta:.0f}s"))
+
+    def collect(futures):
+        for future in futures:
+            counts['fetched' if future.result() else 'missing'] += 1
+
+    for pair in todo:
+        if len(pending) >= max_inflight:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(finished)
+        pending.add(service.submit(*pair))
+        if time.monotonic() - last_report >= report_every:
+            progress()
+            last_report = time.monotonic()
+    finished, _ = wait(pending)
+    collect(finished)
+    progress(final=True)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-fetch posters for every song in the catalog")
+    parser.add_argument('--models', default='models')
+    parser.add_argument('--posters', default='posters')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--rate', type=float, default=15.0, help="max lookups per second")
+    parser.add_argument('--search-url', default=ITUNES_SEARCH_URL)
+    args = parser.parse_args(argv)
+
+    catalog = Catalog.from_artifacts(model_store.load_model(args.models))
+    service = PosterService(args.posters, max_workers=args.workers, search_url=args.search_url,
+                            rate_limiter=RateLimiter(args.rate))
+    try:
+        warm(service, catalog_pairs(catalog), max_inflight=args.workers * 4)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume")
+    finally:
+        service.close()
+    stats = service.stats()
+    print(f"Cache: {stats['entries']} posters, {stats['bytes'] / 1024 / 1024:.1f} MiB, "
+          f"avg fetch {stats['fetch_avg_seconds'] * 1000:.0f} ms, max {stats['fetch_max_seconds'] * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""Build the recommender model from a raw song CSV
+
+Reads the catalog, vectorizes each song's text, computes every song's
+top-K most similar songs in memory-bounded blocks (the full n x n matrix
+is never materialized) and publishes a release under models/ that
+load_models() picks up.
+
+    python preprocess_data.py data/songs.csv --k 50 --memory-mb 256
+
+New releases can be appended without a rebuild. Only the new songs' rows
+and columns of the similarity are computed, and existing songs whose
+top-K list gains a new song are patched:
+
+    python preprocess_data.py data/new_releases.csv --update
+"""
+import argparse
+import time
+from contextlib import contextmanager
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from mrs import features, model_store
+from mrs.ann import DEFAULT_BITS, DEFAULT_PROBES, DEFAULT_TABLES, AnnIndex
+from mrs.catalog import Catalog, find_duration_column, find_rating_column, parse_duration
+from mrs.engine import top_k
+from mrs.neighbors import DEFAULT_K, NeighborIndex
+
+
+@contextmanager
+def stage(name, timings):
+    print(f"▶ {name}...", flush=True)
+    started = time.perf_counter()
+    yield
+    timings[name] = round(time.perf_counter() - started, 3)
+    print(f"  {name} took {timings[name]:.2f}s", flush=True)
+
+
+def load_catalog(path):
+    """Read and clean the raw CSV into the table the app displays"""
+    df = pd.read_csv(path)
+    df.columns = [c.strip() for c in df.columns]
+    title_col = df.columns[0]
+    text_cols = [c for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])]
+    df[text_cols] = df[text_cols].apply(lambda s: s.str.strip())
+    df = df[df[title_col].notna() & (df[title_col].astype(str) != '')]
+    df = df.drop_duplicates().reset_index(drop=True)
+
+    rating_col = find_rating_column(df.columns)
+    if rating_col:
+        df[rating_col] = pd.to_numeric(df[rating_col], errors='coerce')
+    df[features.COMBINED_COLUMN] = features.combined_text(df)
+    return df
+
+
+def build(csv_path, root='models', k=DEFAULT_K, memory_mb=features.DEFAULT_MEMORY_MB, publish=True,
+          backend='exact', ann_params=None):
+    """Run the whole pipeline; returns (release path, per-stage timings)
+
+    With ``backend='ann'`` the quadratic neighbour computation is skipped
+    and an LSH index (mrs.ann, built with ``ann_params``) is stored in the
+    release instead.
+    """
+    timings = {}
+    with stage("Loading catalog", timings):
+        df = load_catalog(csv_path)
+        print(f"  {len(df)} songs")
+
+    with stage("Vectorizing", timings):
+        vectorizer = features.fit_vectorizer(df[features.COMBINED_COLUMN])
+        matrix = features.vectorize(vectorizer, df[features.COMBINED_COLUMN])
+        print(f"  {matrix.shape[1]} terms, {matrix.nnz} non-zeros")
+
+    ann = None
+    if backend == 'ann':
+        with stage("Building ANN index", timings):
+            ann = AnnIndex(matrix, **(ann_params or {}))
+            print(f"  {ann.nbytes / 1024 / 1024:.1f} MiB index ({ann.params})")
+        neighbors = NeighborIndex.from_rows(([], []) for _ in range(len(df)))
+    else:
+        with stage("Computing top-K neighbours", timings):
+            rows = features.top_k_rows(matrix, matrix, k, self_offset=0, memory_mb=memory_mb)
+            neighbors = NeighborIndex.from_rows(rows)
+            print(f"  {neighbors.nbytes / 1024 / 1024:.1f} MiB index "
+                  f"(dense would be {len(df) ** 2 * 4 / 1024 / 1024:.1f} MiB)")
+
+    with stage("Writing release", timings):
+        arrays = {**features.to_arrays(matrix), 'vocabulary': features.vocabulary_array(vectorizer)}
+        duration_col = find_duration_column(df.columns)
+        if duration_col:
+            arrays['durations'] = df[duration_col].map(parse_duration).to_numpy(dtype=np.int32)
+        # The requested K, not the longest row: a catalog of n songs only fills n - 1
+        meta = {'source': str(csv_path), 'k': k, 'n_features': matrix.shape[1],
+                'similarity_backend': backend, 'timings': timings}
+        if ann is not None:
+            arrays.update(ann.to_arrays())
+            meta['ann'] = ann.params
+        path = model_store.write_release(root, df, neighbors, arrays=arrays, meta=meta, publish=publish)
+
+    print(f"{'Published' if publish else 'Wrote'} {path} "
+          f"in {sum(timings.values()):.2f}s ({', '.join(f'{n}: {t:.2f}s' for n, t in timings.items())})")
+    return path, timings
+
+
+def merge_neighbors(old_idx, old_scores, new_idx, new_scores, k):
+    """Top-k of an existing neighbour row plus new candidates"""
+    idx = np.concatenate([old_idx, new_idx])
+    scores = np.concatenate([old_scores, new_scores])
+    best = top_k(scores, k)
+    return idx[best], scores[best]
+
+
+def patch_neighbors(neighbors, old_matrix, new_matrix, k, memory_mb):
+    """Neighbour rows for the old songs after the new songs join the catalog"""
+    n_old = neighbors.n_songs
+    lengths = np.diff(neighbors.indptr)
+    row_min = np.full(n_old, -np.inf, dtype=np.float32)
+    full = (lengths >= k) & (lengths > 0)
+    row_min[full] = np.minimum.reduceat(neighbors.scores, neighbors.indptr[:-1][full])
+    new_ids = np.arange(n_old, n_old + new_matrix.shape[0])
+
+    patched = 0
+    for start, block in features.similarity_blocks(old_matrix, new_matrix, memory_mb):
+        stop = start + len(block)
+        # A row only changes if some new song beats its current k-th neighbour
+        affected = block.max(axis=1) > row_min[start:stop]
+        for offset in range(len(block)):
+            i = start + offset
+            idx, scores = neighbors.row(i)
+            if affected[offset]:
+                patched += 1
+                yield merge_neighbors(idx, scores, new_ids, block[offset], k)
+            else:
+                yield idx, scores
+    print(f"  patched {patched} of {n_old} existing songs")
+
+
+def update(csv_path, root='models', k=None, memory_mb=features.DEFAULT_MEMORY_MB, publish=True):
+    """Append the songs in ``csv_path`` to the current release as a new release"""
+    timings = {}
+    with stage("Opening current release", timings):
+        base = model_store.load_model(root)
+        missing = [name for name in features.FEATURE_ARRAYS + ('vocabulary',) if name not in base.arrays]
+        if missing:
+            raise SystemExit(f"Release {base.version} has no feature vectors; run a full build first")
+        if base.manifest.get('similarity_backend') == 'ann':
+            raise SystemExit("Incremental updates patch the exact neighbour index; "
+                             "rebuild ANN releases with a full build")
+        k = k or base.manifest['k']
+        vectorizer = features.vectorizer_from_vocabulary(base.arrays['vocabulary'])
+        old_matrix = features.from_arrays(base.arrays, len(base.arrays['vocabulary']))
+
+    with stage("Loading new songs", timings):
+        new_df = load_catalog(csv_path).reindex(columns=list(base.columns))
+        # A song is its title plus album (or singer), resolved by name like the app does
+        catalog = Catalog(base.columns, base.neighbors)
+        key_cols = [col for col in (catalog.column('title'), catalog.column('album')) if col]
+        known = set(zip(*(np.asarray(base.columns[col]).astype(str) for col in key_cols)))
+        is_new = [key not in known for key in zip(*(new_df[col].fillna('').astype(str) for col in key_cols))]
+        new_df = new_df[is_new].reset_index(drop=True)
+        new_df[features.COMBINED_COLUMN] = features.combined_text(new_df)
+        print(f"  {len(new_df)} new songs ({len(is_new) - len(new_df)} already in the catalog)")
+        if new_df.empty:
+            return None, timings
+
+    with stage("Vectorizing new songs", timings):
+        # The vocabulary is fixed; words never seen before only count after a full rebuild
+        new_matrix = features.vectorize(vectorizer, new_df[features.COMBINED_COLUMN])
+        all_matrix = sparse.vstack([old_matrix, new_matrix], format='csr')
+
+    with stage("Computing new songs' neighbours", timings):
+        new_rows = list(features.top_k_rows(new_matrix, all_matrix, k, self_offset=base.neighbors.n_songs,
+                                            memory_mb=memory_mb))
+
+    with stage("Patching existing neighbours", timings):
+        old_rows = patch_neighbors(base.neighbors, old_matrix, new_matrix, k, memory_mb)
+        neighbors = NeighborIndex.from_rows(chain(old_rows, new_rows))
+
+    with stage("Writing release", timings):
+        df = pd.concat([base.df, new_df], ignore_index=True)
+        arrays = {**features.to_arrays(all_matrix), 'vocabulary': np.asarray(base.arrays['vocabulary'])}
+        if 'durations' in base.arrays:
+            duration_col = find_duration_column(df.columns)
+            added = new_df[duration_col].map(parse_duration) if duration_col else pd.Series(0, index=new_df.index)
+            arrays['durations'] = np.concatenate([base.arrays['durations'], added.to_numpy(dtype=np.int32)])
+        meta = {'source': str(csv_path), 'base_version': base.version, 'incremental': True, 'k': k,
+                'n_features': all_matrix.shape[1], 'timings': timings}
+        path = model_store.write_release(root, df, neighbors, arrays=arrays, meta=meta, publish=publish)
+
+    print(f"{'Published' if publish else 'Wrote'} {path} on top of {base.version} "
+          f"in {sum(timings.values()):.2f}s")
+    return path, timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the recommender model from a song CSV")
+    parser.add_argument('csv', help="raw catalog CSV (first column is the song title)")
+    parser.add_argument('--models', default='models', help="model root to publish into")
+    parser.add_argument('--k', type=int, default=None,
+                        help=f"neighbours kept per song (default {DEFAULT_K}, or the current release's K with --update)")
+    parser.add_argument('--memory-mb', type=int, default=features.DEFAULT_MEMORY_MB,
+                        help="memory budget for one dense similarity block")
+    parser.add_argument('--no-publish', action='store_true', help="write the release without making it current")
+    parser.add_argument('--backend', choices=['exact', 'ann'], default='exact',
+                        help="'ann' skips the neighbour index for very large catalogs (see mrs.ann)")
+    parser.add_argument('--ann-tables', type=int, default=DEFAULT_TABLES, help="ANN hash tables (recall vs memory)")
+    parser.add_argument('--ann-bits', type=int, default=DEFAULT_BITS, help="ANN bits per table (fewer candidates)")
+    parser.add_argument('--ann-probes', type=int, default=DEFAULT_PROBES,
+                        help="ANN extra buckets probed per table (recall vs latency)")
+    parser.add_argument('--update', action='store_true',
+                        help="append the CSV's songs to the current release instead of rebuilding")
+    args = parser.parse_args(argv)
+    if args.update:
+        update(args.csv, root=args.models, k=args.k, memory_mb=args.memory_mb, publish=not args.no_publish)
+    else:
+        build(args.csv, root=args.models, k=args.k or DEFAULT_K, memory_mb=args.memory_mb,
+              publish=not args.no_publish, backend=args.backend,
+              ann_params={'n_tables': args.ann_tables, 'n_bits': args.ann_bits, 'n_probes': args.ann_probes})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+import preprocess_data
+
+SONGS = pd.DataFrame({
+    'Song': ['Excuses', 'So High', 'Lover', 'Same Beef', 'Brown Munde'],
+    'Singer/Artists': ['AP Dhillon', 'Sidhu Moosewala', 'Diljit Dosanjh', 'Bohemia', 'AP Dhillon'],
+    'Mood': ['Chill', 'Energetic', 'Romantic', 'Energetic', 'Chill'],
+    'Rating': [4.5, 4.8, 4.2, 4.0, 4.6],
+})
+
+
+@pytest.fixture
+def songs_csv(tmp_path):
+    path = tmp_path / 'songs.csv'
+    SONGS.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def models(songs_csv, tmp_path):
+    """Model root with one published release built from SONGS"""
+    root = str(tmp_path / 'models')
+    preprocess_data.build(songs_csv, root=root, k=3)
+    return root
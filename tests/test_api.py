@@ -0,0 +1,51 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from mrs.api import create_app
+from mrs.registry import ModelRegistry
+
+
+def call(models, method, path, **kwargs):
+    async def run():
+        registry = ModelRegistry(models, watch=False, warm=False)
+        async with TestClient(TestServer(create_app(registry, workers=1))) as client:
+            response = await client.request(method, path, **kwargs)
+            return response.status, await response.json()
+    return asyncio.run(run())
+
+
+def test_negative_page_names_the_lower_bound(models):
+    status, body = call(models, 'GET', '/search?q=sidhu&page=-1')
+    assert status == 400
+    assert body == {'error': "page must be at least 0"}
+
+
+def test_bounded_parameter_names_both_bounds(models):
+    status, body = call(models, 'GET', '/mood?mood=Chill&n=0')
+    assert status == 400
+    assert body == {'error': "n must be between 1 and 100"}
+
+
+def test_unknown_title_is_an_error_on_get_and_post(models):
+    status, body = call(models, 'GET', '/recommend?title=Nope')
+    assert status == 404
+    assert body == {'error': "unknown title"}
+
+    status, body = call(models, 'POST', '/recommend', json={'titles': ['Excuses', 'Nope'], 'n': 2})
+    assert status == 200
+    assert body['results']['Nope'] == {'error': "unknown title"}
+    assert [song['title'] for song in body['results']['Excuses']]
+
+
+def test_mood_matches_any_or_all_of_several_moods(models):
+    status, body = call(models, 'GET', '/mood?mood=Chill,Energetic&n=10')
+    assert status == 200
+    # Best rated first across both moods
+    assert [song['title'] for song in body['results']] == ['So High', 'Brown Munde', 'Excuses', 'Same Beef']
+
+    status, body = call(models, 'GET', '/mood?mood=Chill,Energetic&match=all')
+    assert (status, body['results']) == (200, [])
+
+    status, body = call(models, 'GET', '/mood?mood=Chill&match=most')
+    assert status == 400
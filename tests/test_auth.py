@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+from mrs.auth import AuthError, Authenticator, hash_password, verify_password
+
+ITERATIONS = 1000
+
+
+@pytest.fixture
+def auth(tmp_path):
+    authenticator = Authenticator(str(tmp_path / 'users.db'), max_workers=2, iterations=ITERATIONS)
+    authenticator.create_user('amy', 'secret')
+    yield authenticator
+    authenticator.close()
+
+
+def test_password_hashes_are_salted_and_verified():
+    first = hash_password('secret', iterations=ITERATIONS)
+    second = hash_password('secret', iterations=ITERATIONS)
+    assert first != second
+    assert first.startswith(f"pbkdf2_sha256${ITERATIONS}$")
+    assert verify_password('secret', first)
+    assert not verify_password('Secret', first)
+    assert not verify_password('secret', 'garbage')
+
+
+def test_login_issues_a_token_that_resolves_to_the_user(auth):
+    token = auth.submit_login('amy', 'secret').result(timeout=10)
+    assert token
+    assert auth.user_for_token(token) == 'amy'
+    assert auth.login('amy', 'wrong') is None
+    assert auth.login('nobody', 'secret') is None
+    assert auth.user_for_token('forged') is None
+    assert auth.user_for_token(None) is None
+
+
+def test_only_the_token_hash_is_stored(auth):
+    token = auth.login('amy', 'secret')
+    with sqlite3.connect(auth.path) as conn:
+        stored = [row[0] for row in conn.execute("SELECT token_hash FROM sessions")]
+    assert stored and token not in stored
+
+
+def test_expired_tokens_stop_working_and_are_deleted(tmp_path):
+    auth = Authenticator(str(tmp_path / 'users.db'), iterations=ITERATIONS, token_ttl=-1)
+    try:
+        auth.create_user('amy', 'secret')
+        token = auth.login('amy', 'secret')
+        assert auth.user_for_token(token) is None
+        assert auth.purge_expired() == 0
+        auth.login('amy', 'secret')
+        assert auth.purge_expired() == 1
+    finally:
+        auth.close()
+
+
+def test_logout_revokes_only_that_token(auth):
+    first, second = auth.login('amy', 'secret'), auth.login('amy', 'secret')
+    auth.revoke(first)
+    assert auth.user_for_token(first) is None
+    assert auth.user_for_token(second) == 'amy'
+    assert auth.revoke_all() == 1
+    assert auth.user_for_token(second) is None
+
+
+def test_users_must_be_new_unless_replaced(auth):
+    with pytest.raises(AuthError):
+        auth.create_user('amy', 'other')
+    with pytest.raises(AuthError):
+        auth.create_user(' ', 'pw')
+    auth.create_user('amy', 'other', replace=True)
+    assert auth.login('amy', 'secret') is None
+    assert auth.login('amy', 'other')
+
+
+def test_demo_user_only_exists_when_seeded(auth):
+    assert not auth.has_user('gursimran')
+    auth.seed_demo_users()
+    auth.seed_demo_users()
+    assert auth.login('gursimran', '12345')
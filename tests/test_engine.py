@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from mrs.engine import hybrid_scores, recommend_for_seeds, recommend_rows, top_k
+from mrs.neighbors import NeighborIndex
+
+
+def reference_top_k(scores, k, exclude=()):
+    """Stable descending order (ties by lower index), excluded rows dropped"""
+    order = np.argsort(-np.asarray(scores, dtype=np.float64), kind='stable')
+    return [int(i) for i in order if i not in set(np.atleast_1d(exclude).tolist())][:k]
+
+
+TOP_K_CASES = [
+    ([0.5, 0.9, 0.1], 2, None),
+    ([0.5, 0.5, 0.5, 0.5], 2, None),                 # all tied: lowest indices
+    ([0.2, 0.8, 0.8, 0.1, 0.8], 2, None),            # tie straddles the k-th place
+    ([0.2, 0.8, 0.8, 0.1, 0.8], 3, [2]),
+    ([1.0, 0.0, -1.0], 3, None),                     # k == n
+    ([1.0, 0.0, -1.0], 10, None),                    # k > n
+    ([1.0, 0.0, -1.0], 10, [0]),                     # k > n with an exclusion
+    ([0.3, 0.3], 5, [0, 1]),                         # everything excluded
+    ([0.3, 0.3], 0, None),
+    ([], 3, None),
+    ([-np.inf, 0.0, -np.inf], 3, None),
+]
+
+
+@pytest.mark.parametrize('scores, k, exclude', TOP_K_CASES)
+def test_top_k_table(scores, k, exclude):
+    expected = reference_top_k(scores, k, () if exclude is None else exclude)
+    assert top_k(np.asarray(scores, dtype=np.float32), k, exclude=exclude).tolist() == expected
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_top_k_random_ties(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 60))
+    scores = rng.integers(0, 5, size=n).astype(np.float32) / 4
+    k = int(rng.integers(0, n + 3))
+    exclude = rng.choice(n, size=int(rng.integers(0, n + 1)), replace=True)
+    assert top_k(scores, k, exclude=exclude).tolist() == reference_top_k(scores, k, exclude)
+
+
+@pytest.fixture
+def index():
+    """Six songs, every neighbour score a multiple of 1/8 so sums and ties are exact"""
+    rng = np.random.default_rng(3)
+    n = 6
+    dense = rng.integers(0, 5, size=(n, n)).astype(np.float32) / 8
+    dense = np.triu(dense, 1) + np.triu(dense, 1).T
+    rows = [(idx, dense[i, idx]) for i, idx in
+            enumerate(np.array([j for j in range(n) if j != i]) for i in range(n))]
+    ratings = rng.integers(0, 5, size=n).astype(np.float32) / 4
+    return NeighborIndex.from_rows(rows), dense, ratings
+
+
+@pytest.mark.parametrize('topn', [1, 3, 5, 10])
+@pytest.mark.parametrize('use_ratings', [False, True])
+def test_recommend_rows_is_stable_and_excludes_the_query(index, topn, use_ratings):
+    neighbors, dense, ratings = index
+    ratings = ratings if use_ratings else None
+    for query, (idx, scores) in zip(range(6), recommend_rows(neighbors, np.arange(6), ratings, topn)):
+        blended = hybrid_scores(dense[query], ratings)
+        expected = reference_top_k(blended, topn, exclude=[query])
+        assert idx.tolist() == expected
+        assert query not in idx.tolist()
+        np.testing.assert_array_equal(scores, blended[expected])
+
+
+@pytest.mark.parametrize('seeds, weights, exclude', [
+    ([0], None, None),
+    ([0, 3], None, None),
+    ([0, 3], [1, 2], None),
+    ([1, 2, 4], [0.5, 1, 4], [5]),
+    ([0, 1, 2, 3, 4], None, None),                   # only one candidate left
+    ([0, 1, 2, 3, 4, 5], None, None),                # nothing left
+])
+@pytest.mark.parametrize('topn', [1, 2, 10])
+def test_recommend_for_seeds_is_stable_and_skips_seeds(index, seeds, weights, exclude, topn):
+    neighbors, dense, ratings = index
+    w = np.ones(len(seeds), np.float32) if weights is None else np.asarray(weights, np.float32)
+    similarity = (w[:, None] * dense[seeds]).sum(axis=0) / w.sum()
+    blended = hybrid_scores(similarity, ratings)
+    skip = list(seeds) + list(exclude or [])
+    expected = reference_top_k(blended, topn, exclude=skip)
+
+    idx, scores = recommend_for_seeds(neighbors, seeds, ratings, topn, weights=weights, exclude=exclude)
+    assert idx.tolist() == expected
+    assert not set(idx.tolist()) & set(skip)
+    np.testing.assert_allclose(scores, blended[expected], rtol=1e-6)
+
+
+def test_recommend_for_seeds_without_seeds():
+    neighbors = NeighborIndex.from_rows([([1], [0.5]), ([0], [0.5])])
+    idx, scores = recommend_for_seeds(neighbors, [], topn=3)
+    assert idx.tolist() == [] and scores.tolist() == []
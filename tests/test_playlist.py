@@ -0,0 +1,61 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from mrs.playlist import build_playlist, subset_sum
+
+
+def brute_force_gap(durations, low, high):
+    """Smallest distance to the middle of [low, high] over all fitting subsets, or None"""
+    target = (low + high) / 2
+    gaps = [abs(sum(durations[i] for i in subset) - target)
+            for size in range(len(durations) + 1)
+            for subset in combinations(range(len(durations)), size)
+            if all(durations[i] > 0 for i in subset) and low <= sum(durations[i] for i in subset) <= high]
+    return min(gaps) if gaps else None
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_subset_sum_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    durations = rng.integers(0, 300, size=rng.integers(1, 9)).tolist()
+    low = int(rng.integers(-50, 900))
+    high = low + int(rng.integers(0, 120))
+    chosen = subset_sum(durations, low, high)
+    best = brute_force_gap(durations, low, high)
+    if best is None:
+        assert chosen is None
+        return
+    assert len(set(chosen)) == len(chosen)
+    total = sum(durations[i] for i in chosen)
+    assert low <= total <= high
+    assert abs(total - (low + high) / 2) == best
+
+
+def test_short_target_never_overshoots_the_tolerance():
+    durations = [255, 240, 100, 90, 30]
+    playlist = build_playlist(range(5), durations, 120, tolerance=30)
+    assert 90 <= playlist.total <= 150
+    assert 255 not in playlist.seconds
+
+
+def test_nothing_fits_a_tiny_target():
+    playlist = build_playlist(range(3), [255, 240, 300], 60, tolerance=30)
+    assert playlist.rows == [] and playlist.total == 0
+
+
+def test_tracks_without_a_length_are_skipped():
+    durations = [0, np.nan, 200, 180, 240]
+    playlist = build_playlist(range(5), durations, 600, tolerance=30)
+    assert set(playlist.rows) <= {2, 3, 4}
+    assert all(seconds > 0 for seconds in playlist.seconds)
+    assert playlist.total == sum(playlist.seconds) == 620
+
+
+def test_same_arguments_give_the_same_playlist():
+    rng = np.random.default_rng(0)
+    durations = rng.integers(120, 360, size=50)
+    first = build_playlist(np.arange(50), durations, 1800, seed=7)
+    assert first == build_playlist(np.arange(50), durations, 1800, seed=7)
+    assert abs(first.total - 1800) <= 60
@@ -0,0 +1,68 @@
+import os
+import struct
+
+from mrs import poster_cache
+from mrs.poster_cache import PosterCache, poster_key
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00\x00\x00\x0dIHDR' + struct.pack('>II', 400, 400) + b'\x08\x02\x00\x00\x00'
+
+
+def stored_files(directory):
+    return {os.path.join(root, name) for root, _, files in os.walk(directory)
+            for name in files if name.endswith('.jpg')}
+
+
+def test_compaction_keeps_records_from_other_workers(tmp_path):
+    directory = str(tmp_path)
+    limit = int(len(PNG) * 2.5)
+    first = PosterCache(directory, max_bytes=limit)
+    first.put('a', 'x', PNG)
+    first.put('b', 'x', PNG)
+    second = PosterCache(directory, max_bytes=limit)
+    second.put('c', 'x', PNG)
+    # Over the limit: evicts, then rewrites the journal
+    first.put('d', 'x', PNG)
+
+    reopened = PosterCache(directory, max_bytes=limit)
+    assert reopened.peek('c', 'x') is not None
+    assert reopened.peek('d', 'x') is not None
+    # Every file on disk is in the manifest, so nothing is orphaned
+    assert stored_files(directory) == {entry['path'] for entry in reopened.entries.values()}
+
+
+def test_lru_order_survives_restart(tmp_path):
+    directory = str(tmp_path)
+    cache = PosterCache(directory, touch_interval=0)
+    cache.put('old', 'x', PNG)
+    cache.put('new', 'x', PNG)
+    assert cache.get('old', 'x') is not None
+
+    restarted = PosterCache(directory, max_bytes=int(len(PNG) * 2.5))
+    restarted.put('newest', 'x', PNG)
+    # 'new' is the least recently used, even though 'old' was stored first
+    assert restarted.peek('new', 'x') is None
+    assert restarted.peek('old', 'x') is not None
+    assert restarted.peek('newest', 'x') is not None
+
+
+def journal_lines(directory):
+    with open(os.path.join(directory, 'manifest.jsonl'), 'rb') as f:
+        return sum(1 for _ in f)
+
+
+def test_journal_stays_bounded_under_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(poster_cache, 'COMPACT_MIN_RECORDS', 20)
+    directory = str(tmp_path)
+    cache = PosterCache(directory, touch_interval=0)
+    cache.put('song', 'x', PNG)
+    for i in range(200):
+        cache.get('song', 'x')
+        cache.record_miss('gone', 'x', error=True)
+    # One live poster and one live miss; the touch and miss history is compacted away
+    assert journal_lines(directory) <= 20
+    assert cache._records == journal_lines(directory)
+
+    reopened = PosterCache(directory)
+    assert reopened.peek('song', 'x') is not None
+    assert reopened.is_known_miss('gone', 'x')
+    assert reopened._last_used[poster_key('song', 'x')] == cache._last_used[poster_key('song', 'x')]
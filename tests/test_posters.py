@@ -0,0 +1,138 @@
+import json
+import os
+import struct
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from mrs import metrics
+from mrs.poster_cache import PosterCache, poster_key
+from mrs.posters import PosterService
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00\x00\x00\x0dIHDR' + struct.pack('>II', 400, 400) + b'\x08\x02\x00\x00\x00'
+
+
+class StubItunes(BaseHTTPRequestHandler):
+    """Search endpoint plus artwork; the first word of the song picks the behaviour"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.requests[url.path.split('/')[1]] += 1
+        if url.path == '/search':
+            kind = parse_qs(url.query)['term'][0].split()[0]
+            if kind == 'slow':
+                time.sleep(0.3)
+            if kind == 'down':
+                return self._send(500, b'oops', 'text/plain')
+            if kind == 'nothing':
+                return self._send(200, json.dumps({'results': []}).encode(), 'application/json')
+            artwork = f"http://127.0.0.1:{self.server.server_port}/art/{kind}/100x100bb.jpg"
+            body = json.dumps({'results': [{'artworkUrl100': artwork}]}).encode()
+            return self._send(200, body, 'application/json')
+        kind = url.path.split('/')[2]
+        if kind == 'missing':
+            return self._send(404, b'<html>Not Found</html>', 'text/html')
+        if kind == 'html':
+            return self._send(200, b'<html>Sign in</html>', 'text/html')
+        return self._send(200, PNG, 'image/png')
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StubItunes)
+    httpd.requests = Counter()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def service(server, tmp_path):
+    cache = PosterCache(str(tmp_path), miss_ttl=3600, error_ttl=60)
+    service = PosterService(search_url=f"http://127.0.0.1:{server.server_port}/search", cache=cache)
+    service.session.trust_env = False
+    yield service
+    service.close()
+
+
+def stored_files(directory):
+    return [name for _, _, files in os.walk(directory) for name in files if name.endswith('.jpg')]
+
+
+def test_fetch_stores_poster(service, tmp_path):
+    path = service.fetch('ok Song', 'Artist')
+    assert path and os.path.exists(path)
+    entry = service.cache.peek('ok Song', 'Artist')
+    assert (entry['width'], entry['height']) == (400, 400)
+    assert service.cached('ok Song', 'Artist') == path
+
+
+def test_concurrent_requests_share_one_download(service, server):
+    futures = [service.submit('slow Song', 'Artist') for _ in range(10)]
+    assert all(f is futures[0] for f in futures)
+    assert futures[0].result(timeout=5)
+    assert server.requests['search'] == 1
+    assert server.requests['art'] == 1
+
+
+def test_concurrent_fetches_of_different_songs(service, server, tmp_path):
+    songs = [f"slow Song {i}" for i in range(8)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        paths = list(pool.map(lambda song: service.fetch(song, 'Artist'), songs))
+    assert all(paths) and len(set(paths)) == len(songs)
+    # Eight 0.3 s lookups on an 8-worker pool overlap instead of queueing
+    assert time.perf_counter() - started < 1.5
+    assert len(stored_files(tmp_path)) == len(songs)
+
+
+def network_fetches():
+    return metrics.REGISTRY.summary()['counters'].get('poster.network', 0)
+
+
+def test_only_real_downloads_count_as_network(service, server):
+    before = network_fetches()
+    assert service.fetch('nothing Song', 'Artist') is None
+    assert service.submit('nothing Song', 'Artist').result() is None
+    assert service.fetch('ok Song', 'Artist')
+    assert service.submit('ok Song', 'Artist').result()
+    assert network_fetches() - before == 2
+    assert server.requests['search'] == 2
+
+
+def test_no_artwork_is_negatively_cached(service, server):
+    assert service.fetch('nothing Song', 'Artist') is None
+    assert service.cache.is_known_miss('nothing Song', 'Artist')
+    assert service.fetch('nothing Song', 'Artist') is None
+    assert server.requests['search'] == 1
+    expires = service.cache._misses[poster_key('nothing Song', 'Artist')]
+    assert expires > time.time() + 3000
+
+
+@pytest.mark.parametrize('song', ['missing Song', 'html Song', 'down Song'])
+def test_bad_responses_are_errors_not_posters(service, server, tmp_path, song):
+    assert service.fetch(song, 'Artist') is None
+    assert service.cache.peek(song, 'Artist') is None
+    assert stored_files(tmp_path) == []
+    # Remembered with the short error TTL, not the "no artwork" one
+    expires = service.cache._misses[poster_key(song, 'Artist')]
+    assert time.time() < expires <= time.time() + 60
+    assert service.submit(song, 'Artist').result() is None
+    assert server.requests['search'] == 1
@@ -0,0 +1,46 @@
+import json
+import os
+import time
+
+import preprocess_data
+from mrs import model_store
+from mrs.registry import ModelRegistry
+
+
+def wait_for_reload(registry, timeout=10):
+    deadline = time.monotonic() + timeout
+    while registry._loading and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not registry._loading
+
+
+def publish_broken(root, songs_csv):
+    """Publish a release whose manifest lost its 'n_songs' key"""
+    path, _ = preprocess_data.build(songs_csv, root=root, k=3, publish=False)
+    manifest_path = os.path.join(path, model_store.MANIFEST)
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    del manifest['n_songs']
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    model_store.publish_release(root, os.path.basename(path))
+    return os.path.basename(path)
+
+
+def test_broken_release_is_skipped_and_reload_keeps_working(models, songs_csv):
+    registry = ModelRegistry(models, watch=False, warm=False)
+    live = registry.version
+
+    publish_broken(models, songs_csv)
+    assert registry.check()
+    wait_for_reload(registry)
+    assert registry.version == live
+    assert registry.last_error.startswith('KeyError')
+    # The same broken release is not retried
+    assert not registry.check()
+
+    path, _ = preprocess_data.build(songs_csv, root=models, k=3)
+    assert registry.check()
+    wait_for_reload(registry)
+    assert registry.version == os.path.basename(path) != live
+    assert registry.last_error is None
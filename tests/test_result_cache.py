@@ -0,0 +1,54 @@
+import time
+
+import pandas as pd
+
+import preprocess_data
+from conftest import SONGS
+from mrs.registry import ModelRegistry
+from mrs.result_cache import MISSING, ResultCache
+
+
+def swap_to_new_release(registry, tmp_path, songs):
+    csv = tmp_path / 'next.csv'
+    songs.to_csv(csv, index=False)
+    preprocess_data.build(csv, root=registry.root, k=3)
+    assert registry.check()
+    deadline = time.monotonic() + 10
+    while registry._loading and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_swap_invalidates_the_old_versions_results(models, tmp_path):
+    registry = ModelRegistry(models, watch=False, warm=False)
+    cache = ResultCache()
+    cache.watch(registry)
+    calls = []
+
+    @cache.memoize('count')
+    def count(catalog, mood):
+        calls.append(catalog.version)
+        return int((catalog.df['Mood'] == mood).sum())
+
+    old = registry.current()
+    assert count(old, 'Chill') == 2
+    assert count(old, 'Chill') == 2
+    assert len(calls) == 1
+
+    swap_to_new_release(registry, tmp_path, pd.concat([SONGS, SONGS.assign(Song=SONGS['Song'] + ' (Remix)')]))
+    new = registry.current()
+    assert new.version != old.version
+    # Nothing cached for the old version survives the swap
+    assert cache.get((old.version, 'count', ('Chill',), ()), 'count') is MISSING
+    assert count(new, 'Chill') == 4
+    assert calls == [old.version, new.version]
+
+
+def test_entries_are_bounded_and_expire():
+    cache = ResultCache(max_entries=2, ttl=0.05)
+    for key in 'abc':
+        cache.put(key, key.upper())
+    assert cache.get('a') is MISSING
+    assert cache.get('c') == 'C'
+    time.sleep(0.1)
+    assert cache.get('c') is MISSING
+    assert cache.stats()['evictions'] == 1 and cache.stats()['expirations'] == 1
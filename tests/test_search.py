@@ -0,0 +1,35 @@
+from mrs.search import SearchIndex, tokenize
+
+
+def make_index():
+    return SearchIndex({
+        'title': ['Muqabla', 'ਮੁੰਡੇ ਪਿੰਡ ਦੇ', 'Café Nights', 'So High'],
+        'artist': ['Dilon', 'ਸਿੱਧੂ ਮੂਸੇ ਵਾਲਾ', 'Mūsewala', 'Sidhu Moosewala'],
+        'mood': ['Happy', 'Chill', 'Romantic', 'Energetic'],
+    })
+
+
+def test_tokenize_folds_case_and_accents():
+    assert tokenize('Café  NIGHTS!') == ['cafe', 'nights']
+    assert tokenize('Mūsewala') == ['musewala']
+
+
+def test_tokenize_keeps_gurmukhi():
+    tokens = tokenize('ਸਿੱਧੂ ਮੂਸੇ ਵਾਲਾ')
+    assert len(tokens) == 3
+    assert all(tokens)
+
+
+def test_search_gurmukhi_title_and_artist():
+    index = make_index()
+    assert index.search('ਮੁੰਡੇ').rows.tolist() == [1]
+    assert index.search('ਸਿੱਧੂ').rows.tolist() == [1]
+    assert index.search('ਪਿੰਡ ਦੇ').rows.tolist() == [1]
+
+
+def test_search_latin_accents_and_variants():
+    index = make_index()
+    assert index.search('cafe').rows.tolist() == [2]
+    assert set(index.search('moosewala').rows.tolist()) == {2, 3}
+    assert index.search('muqabala').rows.tolist() == [0]
+    assert index.search('dhillon').rows.tolist() == [0]
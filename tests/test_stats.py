@@ -0,0 +1,38 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from mrs.catalog import Catalog
+from mrs.neighbors import NeighborIndex
+from mrs.stats import catalog_stats
+
+
+def frame(ratings):
+    return pd.DataFrame({
+        'Song': [f"Song {i}" for i in range(len(ratings))],
+        'Singer/Artists': ['AP Dhillon'] * len(ratings),
+        'Mood': ['Chill'] * len(ratings),
+        'Rating': ratings,
+    })
+
+
+def test_rating_stats_skip_missing_values():
+    stats = catalog_stats(frame([4.0, np.nan, 5.0]))
+    assert stats['rating'] == {'count': 2, 'mean': 4.5, 'min': 4.0, 'max': 5.0}
+    assert stats['top_rated'] == [2, 0, 1]
+
+
+def test_no_rated_songs_gives_no_rating_stats():
+    for df in (frame([np.nan, np.nan]), frame([])):
+        stats = catalog_stats(df)
+        assert stats['rating'] is None
+        json.dumps(stats, allow_nan=False)
+    assert catalog_stats(frame([np.nan, np.nan]))['top_rated'] == [0, 1]
+
+
+def test_stored_nan_rating_stats_are_ignored():
+    df = frame([np.nan])
+    stored = {**catalog_stats(df), 'rating': {'count': 0, 'mean': float('nan'), 'min': None, 'max': None}}
+    catalog = Catalog.from_frame(df, NeighborIndex.from_rows([([], [])]), stats=stored)
+    assert catalog.stats['rating'] is None
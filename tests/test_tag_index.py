@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from mrs.tag_index import TagIndex, split_tags
+
+MOODS = ['Happy, Energetic', 'Chill', 'Happy', None, 'chill / Romantic', 'Energetic|Happy']
+RATINGS = [4.0, 4.5, np.nan, 5.0, 4.5, 4.8]
+
+
+def brute_force(queries, mode):
+    """Rows by rating, ties by row order, filtered like str.contains per query"""
+    def matches(value, query):
+        return any(query.lower() in tag.lower() for tag in split_tags(value))
+    hits = [all(matches(v, q) for q in queries) if mode == 'all' else any(matches(v, q) for q in queries)
+            for v in MOODS]
+    ratings = np.where(np.isnan(RATINGS), -np.inf, RATINGS)
+    order = np.lexsort((np.arange(len(MOODS)), -ratings))
+    return [int(row) for row in order if hits[row]]
+
+
+@pytest.mark.parametrize('queries', [['happy'], ['chill'], ['happy', 'chill'], ['energetic', 'happy'],
+                                     ['rom', 'chill'], ['nothing']])
+@pytest.mark.parametrize('mode', ['any', 'all'])
+def test_query_matches_brute_force(queries, mode):
+    index = TagIndex(MOODS, RATINGS)
+    assert index.query(queries, mode).tolist() == brute_force(queries, mode)
+    assert index.query(queries, mode, n=2).tolist() == brute_force(queries, mode)[:2]
+
+
+def test_top_is_a_single_mood_query():
+    index = TagIndex(MOODS, RATINGS)
+    assert index.top('Happy', 2).tolist() == brute_force(['happy'], 'any')[:2]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        TagIndex(MOODS, RATINGS).query(['happy'], mode='most')
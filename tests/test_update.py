@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+import preprocess_data
+from mrs import features, model_store
+from mrs.catalog import parse_duration
+from mrs.neighbors import NeighborIndex
+
+K = 3
+BASE = pd.DataFrame({
+    'Song': ['Excuses', 'So High', 'Lover'],
+    'Singer/Artists': ['AP Dhillon', 'Sidhu Moosewala', 'Diljit Dosanjh'],
+    'Album/Movie': ['Hidden Gems', 'So High', 'Moonchild Era'],
+    'Mood': ['Chill', 'Energetic', 'Romantic'],
+    'Rating': [4.5, 4.8, 4.2],
+    'Duration': ['2:56', '3:41', '3:08'],
+})
+FIRST = pd.DataFrame({
+    # 'So High' / 'So High' is already in the catalog; 'Excuses' on another album is not
+    'Song': ['So High', 'Excuses', 'Brown Munde', 'Same Beef'],
+    'Singer/Artists': ['Sidhu Moosewala', 'AP Dhillon', 'AP Dhillon', 'Sidhu Moosewala'],
+    'Album/Movie': ['So High', 'Live in Delhi', 'Brown Munde', 'Same Beef'],
+    'Mood': ['Energetic', 'Chill', 'Energetic', 'Energetic'],
+    'Rating': [4.8, 4.1, 4.6, 4.0],
+    'Duration': ['3:41', '3:10', '4:27', None],
+})
+# Shares no words with the Sidhu Moosewala songs, so their rows must be left alone
+SECOND = pd.DataFrame({
+    'Song': ['Insane', 'GOAT', 'Vibe'],
+    'Singer/Artists': ['AP Dhillon', 'Diljit Dosanjh', 'Diljit Dosanjh'],
+    'Album/Movie': ['Hidden Gems', 'GOAT', 'Moonchild Era'],
+    'Mood': ['Chill', 'Romantic', 'Romantic'],
+    'Rating': [4.3, 4.7, 4.4],
+    'Duration': ['3:35', '3:57', '2:40'],
+})
+
+
+def write_csv(tmp_path, name, df):
+    path = tmp_path / name
+    df.to_csv(path, index=False)
+    return path
+
+
+def assert_matches_full_build(root):
+    """Neighbour rows equal a from-scratch top-K over the release's (fixed) vocabulary"""
+    model = model_store.load_model(root)
+    vectorizer = features.vectorizer_from_vocabulary(model.arrays['vocabulary'])
+    matrix = features.vectorize(vectorizer, model.df[features.COMBINED_COLUMN])
+    expected = NeighborIndex.from_rows(features.top_k_rows(matrix, matrix, K, self_offset=0))
+    assert model.manifest['k'] == K
+    assert model.neighbors.indptr.tolist() == expected.indptr.tolist()
+    assert model.neighbors.indices.tolist() == expected.indices.tolist()
+    np.testing.assert_allclose(model.neighbors.scores, expected.scores, rtol=1e-6)
+    return model
+
+
+def test_update_matches_full_build(tmp_path, capsys):
+    root = str(tmp_path / 'models')
+    preprocess_data.build(write_csv(tmp_path, 'base.csv', BASE), root=root, k=K)
+    # Three songs: every row has fewer than K neighbours
+    base = assert_matches_full_build(root)
+    assert set(np.diff(base.neighbors.indptr)) == {2}
+
+    preprocess_data.update(write_csv(tmp_path, 'first.csv', FIRST), root=root)
+    model = assert_matches_full_build(root)
+    assert model.df['Song'].tolist() == ['Excuses', 'So High', 'Lover', 'Excuses', 'Brown Munde', 'Same Beef']
+    assert model.df['Album/Movie'].tolist()[3] == 'Live in Delhi'
+    expected = [parse_duration(d) for d in ['2:56', '3:41', '3:08', '3:10', '4:27', None]]
+    assert np.asarray(model.arrays['durations']).tolist() == expected
+
+    # Rows are full now, so only rows a new song beats get patched
+    capsys.readouterr()
+    preprocess_data.update(write_csv(tmp_path, 'second.csv', SECOND), root=root)
+    assert "patched 4 of 6 existing songs" in capsys.readouterr().out
+    model = assert_matches_full_build(root)
+    assert model.neighbors.n_songs == 9
+    assert model.manifest['base_version'] != base.version
+
+
+def test_update_with_only_known_songs_writes_nothing(tmp_path):
+    root = str(tmp_path / 'models')
+    preprocess_data.build(write_csv(tmp_path, 'base.csv', BASE), root=root, k=K)
+    before = model_store.current_release(root)
+    path, _ = preprocess_data.update(write_csv(tmp_path, 'again.csv', BASE), root=root)
+    assert path is None
+    assert model_store.current_release(root) == before
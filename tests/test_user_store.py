@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from mrs.user_store import UserStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'users.db')
+
+
+def test_close_flushes_queued_writes(path):
+    # A long flush window: nothing is committed until the batch closes
+    store = UserStore(path, flush_seconds=30)
+    store.add_favorite('amy', 'Excuses')
+    store.record_play('amy', 'Lover', played=1.0)
+    store.set_now_playing('amy', 'Lover')
+    store.close()
+
+    reopened = UserStore(path)
+    try:
+        assert reopened.favorites('amy') == ['Excuses']
+        assert reopened.plays('amy') == [('Lover', 1.0)]
+        assert reopened.now_playing('amy') == 'Lover'
+    finally:
+        reopened.close()
+
+
+def test_writes_apply_in_order_within_a_batch(path):
+    store = UserStore(path, flush_seconds=0.5, batch_size=100)
+    try:
+        for title in ['a', 'b', 'c']:
+            store.add_favorite('amy', title)
+        store.remove_favorite('amy', 'a')
+        store.add_favorite('amy', 'a')
+        for i, title in enumerate(['x', 'y', 'x']):
+            store.record_play('amy', title, played=float(i + 1))
+        store.flush()
+        # Re-adding puts 'a' at the end; plays keep their order and duplicates
+        assert store.favorites('amy') == ['b', 'c', 'a']
+        assert store.plays('amy') == [('x', 1.0), ('y', 2.0), ('x', 3.0)]
+        assert store.plays('amy', limit=2) == [('y', 2.0), ('x', 3.0)]
+        assert store.history('amy') == ['x', 'y']
+    finally:
+        store.close()
+
+
+def test_concurrent_writers_lose_nothing(path):
+    store = UserStore(path, batch_size=16, flush_seconds=0.01)
+    try:
+        def listen(user):
+            for i in range(50):
+                store.record_play(user, f"song {i}")
+            store.add_favorite(user, 'song 0')
+
+        threads = [threading.Thread(target=listen, args=(f"user{n}",)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        store.flush()
+        for n in range(8):
+            assert [title for title, _ in store.plays(f"user{n}")] == [f"song {i}" for i in range(50)]
+            assert store.favorites(f"user{n}") == ['song 0']
+        assert store.last_error is None
+    finally:
+        store.close()
+
+
+def test_writes_after_close_are_rejected(path):
+    store = UserStore(path)
+    store.close()
+    store.close()
+    with pytest.raises(RuntimeError):
+        store.add_favorite('amy', 'Excuses')
+
+
+def test_session_is_an_ordered_set_written_through(path):
+    store = UserStore(path)
+    try:
+        data = store.session('amy')
+        assert data.add_favorite('Excuses')
+        assert not data.add_favorite('Excuses')
+        assert data.record_play('Lover')
+        assert not data.record_play('Lover')
+        data.remove_favorite('Excuses')
+        data.remove_favorite('Never added')
+        store.flush()
+        again = store.session('amy')
+        assert list(again.favorites) == []
+        assert again.history == ['Lover']
+        assert len(store.plays('amy')) == 2
+    finally:
+        store.close()
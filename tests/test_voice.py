@@ -0,0 +1,90 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mrs.catalog import Catalog
+from mrs.neighbors import NeighborIndex
+from mrs.voice import VoiceSearch, read_wav, resolve_title
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'tone_stereo.wav')
+
+
+def read_fixture():
+    with open(FIXTURE, 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def catalog():
+    df = pd.DataFrame({
+        'Song': ['Excuses', 'So High', 'Muqabla', 'Lover', 'Same Beef'],
+        'Singer/Artists': ['AP Dhillon', 'Sidhu Moosewala', 'Dilon', 'Diljit Dosanjh', 'Bohemia'],
+        'Mood': ['Chill', 'Energetic', 'Happy', 'Romantic', 'Energetic'],
+    })
+    return Catalog.from_frame(df, NeighborIndex.from_rows(([], []) for _ in range(len(df))))
+
+
+def test_read_wav_mixes_down_to_mono():
+    pcm, rate = read_wav(read_fixture())
+    assert rate == 8000
+    samples = np.frombuffer(pcm, dtype='<i2')
+    assert len(samples) == 2000
+    assert np.abs(samples).max() > 0
+
+
+def test_read_wav_rejects_8_bit_audio():
+    data = bytearray(read_fixture())
+    data[34:36] = (8).to_bytes(2, 'little')  # bits per sample in the fmt chunk
+    with pytest.raises(ValueError):
+        read_wav(bytes(data))
+
+
+def test_resolve_title_matches_spoken_variants(catalog):
+    assert resolve_title(catalog, 'excuses') == 'Excuses'
+    assert resolve_title(catalog, 'so hi') == 'So High'
+    assert resolve_title(catalog, 'muqabala') == 'Muqabla'
+
+
+def test_resolve_title_only_ranks_index_candidates(catalog, monkeypatch):
+    monkeypatch.setattr(type(catalog.search_index), 'ranked', lambda self, query: np.array([3], np.int32))
+    assert resolve_title(catalog, 'lover') == 'Lover'
+    assert resolve_title(catalog, 'excuses') is None
+
+
+def test_resolve_title_without_a_match(catalog):
+    assert resolve_title(catalog, '') is None
+    assert resolve_title(catalog, 'zzzz qqqq') is None
+
+
+class ScriptedRecognizer:
+    """KaldiRecognizer stand-in that hears one scripted phrase per chunk"""
+
+    def __init__(self, words):
+        self.words = list(words)
+        self.heard = []
+
+    def AcceptWaveform(self, chunk):
+        if self.words:
+            self.heard.append(self.words.pop(0))
+        return False
+
+    def PartialResult(self):
+        return json.dumps({'partial': ' '.join(self.heard)})
+
+    def FinalResult(self):
+        return json.dumps({'text': ' '.join(self.heard)})
+
+
+def test_voice_search_streams_partials(catalog):
+    voice = VoiceSearch(recognizer_factory=lambda rate: ScriptedRecognizer(['so high']))
+    try:
+        job = voice.submit(read_fixture())
+        partials = list(job.updates(timeout=5))
+    finally:
+        voice.close()
+    assert job.done and job.error is None
+    assert partials[-1] == job.text == 'so high'
+    assert resolve_title(catalog, job.text) == 'So High'